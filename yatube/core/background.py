@@ -0,0 +1,69 @@
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_WORKERS = 2  # daemon threads of a process running the jobs
+
+_jobs = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def _run(function, args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Background job %s%r failed', function, args)
+
+
+def _work():
+    while True:
+        function, args = _jobs.get()
+        try:
+            _run(function, args)
+        finally:
+            connections.close_all()
+            _jobs.task_done()
+
+
+def _enqueue(function, args):
+    _start_workers()
+    _jobs.put((function, args))
+
+
+def _start_workers():
+    with _workers_lock:
+        # Threads do not survive a fork of the process
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+        while len(_workers) < BACKGROUND_WORKERS:
+            worker = threading.Thread(
+                target=_work, name='background', daemon=True
+            )
+            worker.start()
+            _workers.append(worker)
+
+
+def run_in_background(function, *args):
+    """Runs the function with the arguments in a worker thread of the
+    process once the current transaction is committed, so the request
+    neither waits for it nor holds its worker.
+
+    Jobs are kept in memory only, a stopped process loses its queue.
+    Jobs must be safe to run again, and the commands which redo their
+    work recover lost ones. With BACKGROUND_JOBS_EAGER, as in tests,
+    jobs run right away, so none outlives its test.
+    """
+    if settings.BACKGROUND_JOBS_EAGER:
+        _run(function, args)
+    else:
+        transaction.on_commit(lambda: _enqueue(function, args))
+
+
+def wait_for_jobs():
+    """Waits until the queued jobs are done, for commands and tests."""
+    _jobs.join()
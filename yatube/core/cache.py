@@ -0,0 +1,259 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.memcached import MemcachedCache
+from django.core.files import locks
+
+try:
+    from django_redis.cache import RedisCache as BaseRedisCache
+except ImportError:  # redis is only needed when it is configured
+    BaseRedisCache = None
+
+
+COMPRESS_MIN_BYTES = 1024  # smaller values are not worth compressing
+LOCK_FILE_NAME = 'lock'  # culling and clear() only touch cache files
+MISSING = object()
+# Seconds a process keeps its metrics before adding them to the cache
+METRICS_FLUSH_INTERVAL = 60
+METRICS_KEY = 'cache:metrics:{}'
+METRICS = ('hits', 'misses', 'sets', 'bytes_read', 'bytes_written')
+# Metrics of every cache in this process, by key prefix and location,
+# and those not added to the cache yet with the time they were added
+_metrics = defaultdict(Counter)
+_unflushed = defaultdict(Counter)
+_flushed = {}
+_metrics_lock = threading.Lock()
+
+
+class Packed:
+    """A pickled, and maybe compressed, value stored in the cache."""
+
+    __slots__ = ('data', 'compressed')
+
+    def __init__(self, data, compressed):
+        self.data = data
+        self.compressed = compressed
+
+    def __getstate__(self):
+        return self.data, self.compressed
+
+    def __setstate__(self, state):
+        self.data, self.compressed = state
+
+
+class SharedCacheMixin:
+    """Compresses big values and counts hits, misses and bytes of a cache
+    backend shared by all workers.
+
+    Values are pickled here to know their size and compressed once they
+    reach COMPRESS_MIN_BYTES, which may be set in the cache settings.
+    Integers are stored as they are, so the backend increments them.
+    Keys are namespaced by the KEY_PREFIX and VERSION settings.
+
+    Every METRICS_FLUSH_INTERVAL seconds, which may be set in the cache
+    settings too, a process adds its metrics to counters in the cache,
+    which the cache_metrics command prints for all workers.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.compress_min_bytes = params.get(
+            'COMPRESS_MIN_BYTES', COMPRESS_MIN_BYTES
+        )
+        self.metrics_flush_interval = params.get(
+            'METRICS_FLUSH_INTERVAL', METRICS_FLUSH_INTERVAL
+        )
+        self.metrics_name = f'{self.key_prefix or "-"}@{location}'
+
+    def _count(self, **values):
+        now = time.monotonic()
+        with _metrics_lock:
+            _metrics[self.metrics_name].update(values)
+            _unflushed[self.metrics_name].update(values)
+            flushed = _flushed.setdefault(self.metrics_name, now)
+            due = now - flushed >= self.metrics_flush_interval
+            if due:
+                _flushed[self.metrics_name] = now
+        if due:
+            self.flush_metrics()
+
+    def flush_metrics(self):
+        """Adds the metrics counted by this process since the last flush
+        to the counters in the cache.
+
+        Integers are neither packed nor counted, so this counts nothing.
+        """
+        with _metrics_lock:
+            values = _unflushed.pop(self.metrics_name, Counter())
+        for name, value in values.items():
+            key = METRICS_KEY.format(name)
+            self.add(key, 0, None)
+            try:
+                self.incr(key, value)
+            except ValueError:
+                # Evicted right after it was added
+                self.add(key, value, None)
+
+    def read_metrics(self):
+        """Returns the metrics of all the workers kept in the cache, read
+        from the backend, so reading them counts nothing.
+        """
+        backend = super(SharedCacheMixin, self)
+        return {
+            name: backend.get(METRICS_KEY.format(name), 0)
+            for name in METRICS
+        }
+
+    def _pack(self, value):
+        # add() of some backends packs and then calls set()
+        if isinstance(value, Packed):
+            return value
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        compressed = len(data) >= self.compress_min_bytes
+        if compressed:
+            data = zlib.compress(data)
+        self._count(sets=1, bytes_written=len(data))
+        return Packed(data, compressed)
+
+    def _unpack(self, value):
+        if not isinstance(value, Packed):
+            return value
+        self._count(bytes_read=len(value.data))
+        data = value.data
+        if value.compressed:
+            data = zlib.decompress(data)
+        return pickle.loads(data)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        if value is MISSING:
+            self._count(misses=1)
+            return default
+        self._count(hits=1)
+        return self._unpack(value)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        self._count(hits=len(values), misses=len(keys) - len(values))
+        return {key: self._unpack(value) for key, value in values.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return super().set(key, self._pack(value), timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return super().add(key, self._pack(value), timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {key: self._pack(value) for key, value in data.items()}
+        return super().set_many(data, timeout, version)
+
+    def delete_if_equal(self, key, value, version=None):
+        """Deletes the key if it still holds the value, as a lock is
+        released by its owner only. Backends which compare and delete
+        at once override it, here it is a get() and a delete().
+        """
+        if self.get(key, MISSING, version) != value:
+            return False
+        self.delete(key, version)
+        return True
+
+
+class FileCache(SharedCacheMixin, FileBasedCache):
+    """Cache in a directory, shared by the workers of one host.
+
+    It stands in for memcached or redis locally. The file backend
+    compresses every value itself, so only bigger ones are compressed
+    twice.
+
+    add() and incr() of the file backend read and then write, so they
+    are run under a lock of the cache directory, shared by all the
+    processes of the host. incr() keeps the expiry of the value.
+    """
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, LOCK_FILE_NAME), 'ab') as file:
+            locks.lock(file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(file)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def delete_if_equal(self, key, value, version=None):
+        with self._locked():
+            return super().delete_if_equal(key, value, version)
+
+    def incr(self, key, delta=1, version=None):
+        path = self._key_to_file(key, version)
+        with self._locked():
+            try:
+                with open(path, 'rb') as file:
+                    expiry = pickle.load(file)
+                    value = pickle.loads(zlib.decompress(file.read()))
+            except (FileNotFoundError, EOFError):
+                expiry, value = 0, None
+            if value is None or expiry is not None and expiry < time.time():
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            descriptor, temp_path = tempfile.mkstemp(dir=self._dir)
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(pickle.dumps(expiry, self.pickle_protocol))
+                file.write(
+                    zlib.compress(pickle.dumps(value, self.pickle_protocol))
+                )
+            os.replace(temp_path, path)
+        return value
+
+    def get_many(self, keys, version=None):
+        # The file backend reads keys one by one through get(), which
+        # unpacks and counts them already
+        return BaseCache.get_many(self, keys, version)
+
+
+class SharedMemcachedCache(SharedCacheMixin, MemcachedCache):
+    pass
+
+
+if BaseRedisCache is not None:
+    class RedisCache(SharedCacheMixin, BaseRedisCache):
+        DELETE_IF_EQUAL = (
+            "if redis.call('get', KEYS[1]) == ARGV[1] then "
+            "return redis.call('del', KEYS[1]) end return 0"
+        )
+
+        def delete_if_equal(self, key, value, version=None):
+            client = self.client
+            return bool(client.get_client(write=True).eval(
+                self.DELETE_IF_EQUAL, 1,
+                client.make_key(key, version=version),
+                client.encode(self._pack(value))
+            ))
+
+
+def cache_metrics():
+    """Returns metrics of the caches used by this process."""
+    with _metrics_lock:
+        return {name: dict(values) for name, values in _metrics.items()}
+
+
+def reset_cache_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+        _unflushed.clear()
+        _flushed.clear()
@@ -0,0 +1,48 @@
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from django.template.loader import render_to_string
+
+PLACEHOLDER = '<!--fragment {} {}-->'
+PLACEHOLDER_PATTERN = re.compile(r'<!--fragment (\w+) ([^ >]*)-->')
+_fragments = {}
+
+
+def fragment(name):
+    """Registers a function rendering a per-user fragment by its name.
+
+    The function gets the request and the string parameters of the
+    placeholder, and returns HTML.
+    """
+    def register(render):
+        _fragments[name] = render
+        return render
+    return register
+
+
+def placeholder(name, **params):
+    """Returns a placeholder which FragmentMiddleware replaces with the
+    fragment rendered for the user of the request.
+
+    Parameters are urlencoded, so they never close the HTML comment.
+    """
+    return PLACEHOLDER.format(name, urlencode(params))
+
+
+def render_fragment(request, name, params):
+    return _fragments[name](request, **params)
+
+
+def stitch(request, content):
+    """Replaces all the placeholders of the content with fragments."""
+    return PLACEHOLDER_PATTERN.sub(
+        lambda match: render_fragment(
+            request, match[1], dict(parse_qsl(match[2]))
+        ),
+        content
+    )
+
+
+@fragment('header_user')
+def header_user(request):
+    return render_to_string('includes/header_user.html', request=request)
@@ -0,0 +1,86 @@
+import threading
+from contextlib import contextmanager
+
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(CachedDBKVStore):
+    """Thumbnail store in the shared cache, written through to the
+    database, which may read the thumbnails of many images at once.
+
+    Within prefetched() the thumbnails of the images are read by two
+    multi-gets, and the thumbnail tags rendered meanwhile take them from
+    memory instead of doing a lookup each.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    @contextmanager
+    def prefetched(self, images):
+        sources = [
+            add_prefix(ImageFile(image).key, 'thumbnails')
+            for image in images if image
+        ]
+        values = self._get_many_raw(sources)
+        values.update(self._get_many_raw([
+            add_prefix(key)
+            for value in values.values() if value is not None
+            for key in deserialize(value)
+        ]))
+        previous = getattr(self._local, 'values', None)
+        self._local.values = {**(previous or {}), **values}
+        try:
+            yield
+        finally:
+            self._local.values = previous
+
+    def _get_many_raw(self, keys):
+        """Returns values of the keys, None for missing ones, reading the
+        database only for the keys which are not in the cache.
+        """
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing).values_list(
+                    'key', 'value'
+                )
+            )
+            self.cache.set_many(
+                {key: stored.get(key, EMPTY_VALUE) for key in missing},
+                settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(stored)
+        return {
+            key: None if values.get(key, EMPTY_VALUE) == EMPTY_VALUE
+            else values[key]
+            for key in keys
+        }
+
+    def _get_raw(self, key):
+        values = getattr(self._local, 'values', None)
+        if values is not None and key in values:
+            return values[key]
+        return super()._get_raw(key)
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        values = getattr(self._local, 'values', None)
+        if values is not None:
+            values[key] = value
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        values = getattr(self._local, 'values', None)
+        if values is not None:
+            for key in keys:
+                values.pop(key, None)
@@ -0,0 +1,226 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+# Media never change under their names: uploads are named by content
+# and thumbnails by their source and options
+MEDIA_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Static files under their plain names change with the code
+STATIC_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+# Variants collectstatic writes next to the files, by preference
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class LimitedReader:
+    """Reads at most length bytes of the file from where it is.
+
+    It keeps fileno() of the file, so servers which send files with
+    sendfile() up to Content-Length, as gunicorn does, still send a
+    range with no copying through Python.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def _byte_range(header, size):
+    """Returns the first and the last byte of a single range, or None
+    if the whole file is to be sent. Raises ValueError if the range is
+    out of the file.
+
+    Several ranges at once are answered with the whole file.
+    """
+    match = BYTE_RANGE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            # An empty file has no last bytes to send
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError('Range starts after the end of the file')
+    end = int(last) if last else size - 1
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def stat_file(root, path):
+    """Returns the full path and the stat of a regular file under the
+    root, raises Http404 for anything else.
+    """
+    try:
+        full_path = safe_join(root, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404
+    return full_path, file_stat
+
+
+def file_validators(file_stat):
+    """Returns a strong ETag and the modification time of a file."""
+    etag = quote_etag(
+        f'{file_stat.st_ino:x}-{file_stat.st_size:x}-'
+        f'{file_stat.st_mtime_ns:x}'
+    )
+    return etag, int(file_stat.st_mtime)
+
+
+def guess_content_type(full_path):
+    return mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+
+def serve_media(request, path):
+    """Serves a file of MEDIA_ROOT with strong validators, a single byte
+    range and far future caching.
+
+    The web server sends the file if MEDIA_SENDFILE says how:
+    'x-accel' redirects nginx to MEDIA_ACCEL_PREFIX, 'x-sendfile' hands
+    the path to Apache or lighttpd. Otherwise the file is streamed by
+    FileResponse, which servers send with the wsgi.file_wrapper.
+    """
+    full_path, file_stat = stat_file(settings.MEDIA_ROOT, path)
+    etag, last_modified = file_validators(file_stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        if settings.MEDIA_SENDFILE == 'x-accel':
+            response = HttpResponse(content_type=guess_content_type(full_path))
+            response['X-Accel-Redirect'] = (
+                settings.MEDIA_ACCEL_PREFIX + quote(path)
+            )
+        elif settings.MEDIA_SENDFILE == 'x-sendfile':
+            response = HttpResponse(content_type=guess_content_type(full_path))
+            response['X-Sendfile'] = full_path
+        else:
+            response = file_response(
+                request, full_path, file_stat.st_size,
+                guess_content_type(full_path), etag, last_modified
+            )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = MEDIA_CACHE_CONTROL
+    return response
+
+
+def _accepted_variant(request, full_path):
+    """Returns the encoding, the path and the stat of the best
+    precompressed variant of the file the client accepts, if any.
+    """
+    accepted = {
+        coding.split(';')[0].strip()
+        for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+        if not re.search(r';\s*q=0(\.0*)?\s*$', coding)
+    }
+    for encoding, suffix in STATIC_ENCODINGS:
+        if encoding in accepted:
+            try:
+                file_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            if stat.S_ISREG(file_stat.st_mode):
+                return encoding, full_path + suffix, file_stat
+    return None
+
+
+def serve_static(request, path):
+    """Serves a file of STATIC_ROOT, precompressed if the client takes
+    it, with strong validators.
+
+    Names hashed by the manifest are cached for a year, plain names are
+    revalidated. Compressed variants are separate representations, with
+    their own ETags and byte ranges.
+    """
+    full_path, file_stat = stat_file(settings.STATIC_ROOT, path)
+    content_type = guess_content_type(full_path)
+    encoding = None
+    variant = _accepted_variant(request, full_path)
+    if variant is not None:
+        encoding, full_path, file_stat = variant
+    etag, last_modified = file_validators(file_stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = file_response(
+            request, full_path, file_stat.st_size, content_type, etag,
+            last_modified
+        )
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    hashed_names = getattr(staticfiles_storage, 'hashed_files', {}).values()
+    response['Cache-Control'] = (
+        MEDIA_CACHE_CONTROL if path in hashed_names else STATIC_CACHE_CONTROL
+    )
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def file_response(request, full_path, size, content_type, etag,
+                  last_modified):
+    """Streams the file, or the byte range asked for while If-Range
+    matches.
+    """
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (etag, http_date(last_modified)):
+        header = None
+    try:
+        byte_range = _byte_range(header, size) if header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(
+            LimitedReader(file, end - start + 1),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
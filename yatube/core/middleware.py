@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .fragments import stitch
+
+
+class EdgeCacheMiddleware:
+    """Sets the headers a caching proxy in front of the site goes by.
+
+    Pages which views tag with surrogate_keys are public for guests:
+    the proxy keeps them for EDGE_CACHE_MAX_AGE or until their keys are
+    purged, browsers revalidate them by ETag every time. Stale copies
+    sent while a page is rendered again are not kept. Pages of logged
+    in users, and any response setting a cookie, are private, and the
+    untagged pages of logged in users are never stored by the proxy.
+
+    It goes right after SecurityMiddleware, so it sees the session and
+    CSRF cookies other middlewares set on the way out.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Cache-Control'):
+            return response
+        user = getattr(request, 'user', None)
+        authenticated = user is not None and user.is_authenticated
+        keys = getattr(response, 'surrogate_keys', None)
+        if keys is None or request.method not in ('GET', 'HEAD'):
+            if authenticated:
+                patch_cache_control(response, private=True)
+            return response
+        patch_vary_headers(response, ('Cookie',))
+        if authenticated or response.cookies:
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        if getattr(response, 'stale', False):
+            patch_cache_control(response, max_age=0, s_maxage=0)
+            return response
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=0,
+            s_maxage=settings.EDGE_CACHE_MAX_AGE
+        )
+        response['Surrogate-Key'] = ' '.join(keys)
+        return response
+
+
+class FragmentMiddleware:
+    """Stitches per-user fragments into pages shared by all users.
+
+    Such pages, cached or not, are marked with has_fragments. It goes
+    after CsrfViewMiddleware, so the CSRF cookie is set for the forms
+    of the fragments.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(response, 'has_fragments', False):
+            content = response.content.decode(response.charset)
+            response.content = stitch(request, content)
+            if response.has_header('Content-Length'):
+                response['Content-Length'] = len(response.content)
+        return response
@@ -0,0 +1,58 @@
+import logging
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PURGE_TIMEOUT = 2  # seconds a write waits for the proxy at most
+
+
+class NullPurger:
+    """Purges nothing, for sites with no caching proxy in front."""
+
+    def purge(self, keys):
+        pass
+
+
+class HttpPurger:
+    """Asks the proxy at EDGE_PURGE_URL to drop the responses tagged with
+    any of the keys, by one PURGE request with the Surrogate-Key header,
+    as Varnish with xkey and Fastly take it.
+
+    A proxy which is down is logged, not raised: its pages go stale
+    until their s-maxage, the write itself is done.
+    """
+
+    method = 'PURGE'
+
+    def __init__(self, url=None, timeout=PURGE_TIMEOUT):
+        self.url = url or settings.EDGE_PURGE_URL
+        self.timeout = timeout
+
+    def purge(self, keys):
+        request = Request(
+            self.url,
+            method=self.method,
+            headers={'Surrogate-Key': ' '.join(keys)}
+        )
+        try:
+            with urlopen(request, timeout=self.timeout):
+                pass
+        except (URLError, OSError):
+            logger.exception('Could not purge %s from %s', keys, self.url)
+
+
+def get_purger():
+    return import_string(settings.EDGE_PURGER)()
+
+
+def purge(*keys):
+    """Purges the surrogate keys from the proxy once the transaction is
+    committed, so the proxy does not fetch the page before it changes.
+    """
+    keys = sorted(set(keys))
+    transaction.on_commit(lambda: get_purger().purge(keys))
@@ -0,0 +1,161 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage
+
+TEMP_PREFIX = '.upload-'  # files being written, not stored yet
+LOCK_NAME = TEMP_PREFIX + 'lock'
+# Seconds a file stays claimed after it is stored or reused, while the
+# post saved with it may not be committed yet
+CLAIM_TIMEOUT = 60 * 60
+# Formats which are compressed already are not worth compressing again
+COMPRESSED_EXTENSIONS = (
+    '.br', '.gz', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.woff',
+    '.woff2',
+)
+COMPRESS_MIN_BYTES = 256
+COMPRESS_MIN_RATIO = 0.95  # variants saving less are not kept
+
+
+def iter_files(path):
+    """Yields directory entries of the files under the path, written ones
+    only, reading one directory at a time.
+    """
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(entry.path)
+            elif (entry.is_file(follow_symlinks=False)
+                  and not entry.name.startswith(TEMP_PREFIX)):
+                yield entry
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage which names files by the SHA-256 of their content.
+
+    The upload is hashed while it is streamed into a temporary file next
+    to its place, which is then renamed into place. An identical upload
+    finds its file there already and is dropped, so it is stored, and its
+    thumbnails made, once. The directory asked for and the extension are
+    kept, files are spread over subdirectories by the first two digits
+    of the hash.
+
+    Files are shared, so they are deleted only when nothing uses them,
+    see posts.images.release_image(). A post saved with a file is not
+    committed yet when the file is stored or reused, so these touch the
+    file and it is not deleted for CLAIM_TIMEOUT. Reusing and deleting
+    files are serialized by locked().
+    """
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, LOCK_NAME), 'ab') as file:
+            locks.lock(file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(file)
+
+    def is_claimed(self, name):
+        """Checks if the file was stored or reused lately."""
+        try:
+            modified = os.stat(self.path(name)).st_mtime
+        except FileNotFoundError:
+            return False
+        return modified > time.time() - CLAIM_TIMEOUT
+
+    def get_available_name(self, name, max_length=None):
+        # Names are chosen by content, there is nothing to avoid
+        return name
+
+    @staticmethod
+    def content_name(directory, digest, extension):
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        temp_directory = self.path(directory)
+        os.makedirs(temp_directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=temp_directory, prefix=TEMP_PREFIX
+        )
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(descriptor, 'wb') as temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            name = self.content_name(
+                directory, digest.hexdigest(), extension
+            )
+            path = self.path(name)
+            with self.locked():
+                try:
+                    # The reused file is claimed anew
+                    os.utime(path)
+                except FileNotFoundError:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                    os.replace(temp_path, path)
+                else:
+                    os.remove(temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    """Static files storage which names files by the hash of their content
+    and writes gzip and brotli variants of them.
+
+    Names missing from the manifest, as before collectstatic, are used as
+    they are instead of failing the page.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if not dry_run and processed and not isinstance(
+                processed, Exception
+            ):
+                self.compress(name, hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, *names):
+        """Writes the variants of the files next to them."""
+        for name in names:
+            if not name or name.lower().endswith(COMPRESSED_EXTENSIONS):
+                continue
+            with self.open(name) as file:
+                content = file.read()
+            if len(content) < COMPRESS_MIN_BYTES:
+                continue
+            variants = (
+                ('.gz', gzip.compress(content, 9, mtime=0)),
+                ('.br', brotli.compress(content)),
+            )
+            for suffix, compressed in variants:
+                if len(compressed) > len(content) * COMPRESS_MIN_RATIO:
+                    continue
+                with open(self.path(name + suffix), 'wb') as file:
+                    file.write(compressed)
@@ -0,0 +1,17 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.fragments import placeholder, render_fragment
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, name, **params):
+    """Renders a per-user fragment in place, or leaves a placeholder for
+    it if the page is shared by users.
+    """
+    if context.get('shared_page'):
+        return mark_safe(placeholder(name, **params))
+    params = {key: str(value) for key, value in params.items()}
+    return mark_safe(render_fragment(context.request, name, params))
@@ -0,0 +1,219 @@
+import hashlib
+import math
+import random
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.purge import purge
+from .models import Follow
+
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24  # changes bump generations, not timeouts
+STALE_PAGE_TIMEOUT = 60  # an expired page is served while it is rendered
+LOCK_TIMEOUT = 10  # seconds a crashed worker keeps the page locked
+LOCK_WAIT = 2  # seconds to wait for a page rendered by another worker
+LOCK_POLL_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1  # bigger ones refresh pages earlier
+GENERATION_KEY = 'posts:generation:{}'
+MODIFIED_KEY = 'posts:modified:{}'
+PAGE_KEY = 'posts:page:{}'
+# Scope of author names and group slugs, which every post card renders
+NAMES_SCOPE = 'names'
+# Query parameters which change a page, others share its cache entry
+PAGE_PARAMS = ('page', 'cursor')
+
+
+def _initial_generation():
+    """Returns a generation above any an evicted counter has reached."""
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    """Returns the current generations of the scopes and the time any
+    of them was changed last, read at once.
+
+    A scope with no time recorded is taken as changed right now.
+    """
+    generation_keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    modified_keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    values = cache.get_many(generation_keys + modified_keys)
+    for key in generation_keys:
+        if key not in values:
+            cache.add(key, _initial_generation(), None)
+            values[key] = cache.get(key)
+    for key in modified_keys:
+        if key not in values:
+            cache.add(key, time.time(), None)
+            values[key] = cache.get(key, time.time())
+    return (
+        [values[key] for key in generation_keys],
+        max(values[key] for key in modified_keys),
+    )
+
+
+def bump(*scopes):
+    """Moves the scopes to new generations, so pages cached for them
+    are not read anymore, and records the time they were changed.
+
+    The scopes are surrogate keys of the pages as well, so the caching
+    proxy drops them too.
+    """
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+    now = time.time()
+    cache.set_many(
+        {MODIFIED_KEY.format(scope): now for scope in scopes}, None
+    )
+    purge(*scopes)
+
+
+def post_scopes(post):
+    """Returns the scopes of the pages showing the post.
+
+    The post is in the feeds of the followers its author pushes posts
+    to, feeds of pull authors' followers depend on the author scope.
+    """
+    followers = Follow.objects.filter(
+        author_id=post.author_id,
+        pull=False
+    ).values_list('user_id', flat=True)
+    return {
+        'posts',
+        f'post:{post.pk}',
+        f'author:{post.author_id}',
+        f'group:{post.group_id}',
+        *(f'feed:{user_id}' for user_id in followers.iterator()),
+    }
+
+
+def page_key(request, shared=False):
+    """Returns the cache key of the page for the user, or for all users
+    if the page is shared.
+    """
+    if shared:
+        user = 'shared'
+    elif request.user.is_authenticated:
+        user = request.user.pk
+    else:
+        user = 'anon'
+    query = urlencode([
+        (name, request.GET[name])
+        for name in PAGE_PARAMS if name in request.GET
+    ])
+    source = f'{request.path}?{query}:{user}'
+    return PAGE_KEY.format(hashlib.md5(source.encode()).hexdigest())
+
+
+def _is_fresh(entry, generations):
+    """Checks if the cached page may be served as it is, or is to be
+    refreshed a bit before it expires (XFetch).
+    """
+    if entry is None or entry['generations'] != generations:
+        return False
+    early = -entry['delta'] * EARLY_REFRESH_BETA * math.log(
+        1 - random.random()
+    )
+    return time.time() + early < entry['expires']
+
+
+def _wait_for_page(key, generations):
+    """Waits for another worker to render the page, returns its entry
+    or None if it is still not there.
+    """
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry['generations'] == generations:
+            return entry
+    return None
+
+
+def cached_page(request, scopes, render_page, shared=False):
+    """Returns the page cached per user for the current generations of
+    the scopes, rendering it with render_page() if there is none.
+
+    A shared page is cached once for all users and has to be rendered
+    with the shared_page context variable, so that its fragments are
+    stitched in per user.
+    """
+    key = page_key(request, shared)
+    scopes = [NAMES_SCOPE, *scopes]
+    generations, last_modified = get_versions(scopes)
+    last_modified = int(last_modified)
+    etag = _etag(request, generations, shared)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = _cached_response(key, generations, render_page, shared)
+        if not getattr(response, 'stale', False):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+    response.surrogate_keys = scopes
+    return response
+
+
+def _etag(request, generations, shared):
+    """Returns the ETag of the page for the user and the generations.
+
+    Forms stitched into shared pages for logged in users carry the CSRF
+    token, which login rotates, so the token is a part of their ETag.
+    """
+    source = f'{page_key(request)}:{generations}'
+    if shared and request.user.is_authenticated:
+        get_token(request)
+        source = f'{source}:{request.META["CSRF_COOKIE"]}'
+    return quote_etag(hashlib.md5(source.encode()).hexdigest())
+
+
+def _cached_response(key, generations, render_page, shared):
+    # One request renders the page under a lock, others get the stale
+    # copy meanwhile or wait for the new one if there is none
+    entry = cache.get(key)
+    if _is_fresh(entry, generations):
+        return entry['response']
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    locked = cache.add(lock_key, token, LOCK_TIMEOUT)
+    if not locked:
+        if entry is None:
+            entry = _wait_for_page(key, generations)
+        if entry is not None:
+            response = entry['response']
+            # Validators of the current generations do not fit it
+            response.stale = entry['generations'] != generations
+            return response
+    try:
+        started = time.time()
+        response = render_page()
+        response.has_fragments = shared
+        finished = time.time()
+        cache.set(key, {
+            'generations': generations,
+            'response': response,
+            'delta': finished - started,
+            'expires': finished + PAGE_CACHE_TIMEOUT,
+        }, PAGE_CACHE_TIMEOUT + STALE_PAGE_TIMEOUT)
+    finally:
+        if locked:
+            _release_lock(lock_key, token)
+    return response
+
+
+def _release_lock(key, token):
+    delete_if_equal = getattr(cache, 'delete_if_equal', None)
+    if delete_if_equal is not None:
+        delete_if_equal(key, token)
+    elif cache.get(key) == token:
+        cache.delete(key)
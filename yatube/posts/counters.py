@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Post, Group, Comment, Follow, UserStats
+
+User = get_user_model()
+
+
+def _changed(field, delta):
+    """Returns an expression which moves the counter, never below zero."""
+    return Greatest(F(field) + delta, 0)
+
+
+def change_group_posts(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=_changed('posts_count', delta)
+        )
+
+
+def change_post_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_changed('comments_count', delta)
+    )
+
+
+def change_user_counter(user_id, field, delta):
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: _changed(field, delta)}
+    )
+
+
+# Changes of several counters are applied together, so a failed update
+# never leaves one of them moved and the other not
+
+
+@transaction.atomic
+def count_post(author_id, group_id, delta):
+    change_user_counter(author_id, 'posts_count', delta)
+    change_group_posts(group_id, delta)
+
+
+@transaction.atomic
+def move_post(from_group_id, to_group_id):
+    change_group_posts(from_group_id, -1)
+    change_group_posts(to_group_id, 1)
+
+
+@transaction.atomic
+def count_follow(user_id, author_id, delta):
+    change_user_counter(author_id, 'followers_count', delta)
+    change_user_counter(user_id, 'following_count', delta)
+
+
+def get_user_stats(user):
+    """Returns counters of the user, counting them if there are none yet."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_users([user.pk])
+        return UserStats.objects.get(user=user)
+
+
+def _count(model, field, outer='pk'):
+    """Returns a subquery counting rows of the model which refer
+    to the updated row by the field.
+    """
+    rows = model.objects.filter(
+        **{field: OuterRef(outer)}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def recount_groups(pks):
+    return Group.objects.filter(pk__in=pks).update(
+        posts_count=_count(Post, 'group')
+    )
+
+
+def recount_posts(pks):
+    return Post.objects.filter(pk__in=pks).update(
+        comments_count=_count(Comment, 'post')
+    )
+
+
+def recount_users(pks):
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in pks),
+        ignore_conflicts=True
+    )
+    return UserStats.objects.filter(user_id__in=pks).update(
+        posts_count=_count(Post, 'author', 'user_id'),
+        followers_count=_count(Follow, 'author', 'user_id'),
+        following_count=_count(Follow, 'user', 'user_id'),
+    )
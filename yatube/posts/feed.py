@@ -0,0 +1,160 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+
+from core.background import run_in_background
+from .cache import bump
+from .models import Post, Follow, FeedEntry
+from .utils import MergedQuerySet
+
+
+FAN_OUT_BATCH_SIZE = 500  # the number of feed entries inserted at once
+FEED_BACKFILL_POSTS = 100  # the newest posts of an author copied to a feed
+
+
+def pull_threshold():
+    """Returns the number of followers which turns an author to pull mode."""
+    return settings.FEED_PULL_FOLLOWERS_THRESHOLD
+
+
+def is_pull_author(author_id):
+    """Checks if posts of the author are pulled at read time."""
+    return Follow.objects.filter(author_id=author_id, pull=True).exists()
+
+
+def _bulk_insert(entries):
+    """Inserts feed entries in batches, skipping already existing ones."""
+    entries = iter(entries)
+    batch = list(islice(entries, FAN_OUT_BATCH_SIZE))
+    while batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, FAN_OUT_BATCH_SIZE))
+
+
+def _author_entries(user_ids, author_id):
+    """Yields feed entries of the users for the newest posts of the
+    author.
+    """
+    posts = list(
+        Post.objects.filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-pk').values_list(
+            'pk', 'pub_date'
+        )[:FEED_BACKFILL_POSTS]
+    )
+    for user_id in user_ids:
+        for post_id, pub_date in posts:
+            yield FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+
+
+def fan_out_post(post):
+    """Pushes a new post into the feeds of all author's followers."""
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def backfill_feed(follow):
+    """Copies the newest posts of a newly followed author into user's
+    feed.
+
+    A pull author stays one, and an author whose followers exceed the
+    threshold is switched to pull mode, so the new follow is pulled too,
+    and posts pushed before are removed from the feeds.
+    """
+    followers = Follow.objects.filter(author_id=follow.author_id)
+    if (is_pull_author(follow.author_id)
+            or followers.count() > pull_threshold()):
+        pushed = followers.filter(pull=False).exclude(pk=follow.pk)
+        FeedEntry.objects.filter(
+            user_id__in=pushed.values('user_id'),
+            author_id=follow.author_id
+        ).delete()
+        followers.filter(pull=False).update(pull=True)
+        follow.pull = True
+        return
+    _bulk_insert(_author_entries([follow.user_id], follow.author_id))
+
+
+def prune_feed(follow):
+    """Removes posts of an unfollowed author from user's feed.
+
+    A pull author who has lost half of the threshold is switched back
+    to push mode, and the newest posts of the author are copied into
+    the followers' feeds in the background. Half of the threshold keeps
+    authors near it from flapping.
+    """
+    FeedEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id
+    ).delete()
+    if not follow.pull:
+        return
+    followers = Follow.objects.filter(author_id=follow.author_id)
+    if followers.count() > pull_threshold() // 2:
+        return
+    followers.update(pull=False)
+    run_in_background(push_author_posts, follow.author_id)
+
+
+def push_author_posts(author_id):
+    """Copies the newest posts of an author switched back to push mode
+    into the followers' feeds, then drops the feed pages.
+    """
+    if is_pull_author(author_id):
+        return
+    followers = list(
+        Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+    )
+    _bulk_insert(_author_entries(followers, author_id))
+    bump(*(f'feed:{user_id}' for user_id in followers))
+
+
+def feed_posts(user):
+    """Returns posts of user's feed.
+
+    Posts of ordinary authors are read from the materialized feed by
+    its index, posts of pull authors straight from the Post table by
+    the author index, and the two ordered and limited reads are merged.
+    Either way posts are ordered by feed_date and feed_post.
+    """
+    posts = Post.objects.filter(
+        feed_entries__user=user
+    ).annotate(
+        feed_date=F('feed_entries__pub_date'),
+        feed_post=F('feed_entries__post')
+    ).order_by('-feed_date', '-feed_post')
+    pulled = list(
+        Follow.objects.filter(
+            user=user,
+            pull=True
+        ).values_list('author_id', flat=True)
+    )
+    if not pulled:
+        return posts
+    pulled_posts = Post.objects.filter(
+        author_id__in=pulled
+    ).annotate(
+        feed_date=F('pub_date'),
+        feed_post=F('pk')
+    ).order_by('-feed_date', '-feed_post')
+    return MergedQuerySet(posts, pulled_posts)
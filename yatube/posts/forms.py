@@ -1,4 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+
+from .images import ingest_image
 from .models import Post, Comment
 
 
@@ -15,6 +18,13 @@ class PostForm(forms.ModelForm):
             'group': 'Сообщество',
         }
 
+    def clean_image(self):
+        """Scales down and compresses a new upload before it is stored."""
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return ingest_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
 
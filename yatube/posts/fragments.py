@@ -0,0 +1,40 @@
+from django.template.loader import render_to_string
+
+from core.fragments import fragment
+
+from .forms import CommentForm
+
+
+@fragment('post_actions')
+def post_actions(request, post_id, author_id):
+    """Shows the edit button to the author of the post."""
+    if str(request.user.pk) != author_id:
+        return ''
+    return render_to_string(
+        'posts/includes/post_actions.html',
+        {'post_id': post_id},
+        request=request
+    )
+
+
+@fragment('comment_form')
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string(
+        'posts/includes/comment_form.html',
+        {'form': CommentForm(), 'post_id': post_id},
+        request=request
+    )
+
+
+@fragment('switcher')
+def switcher(request, active):
+    """Shows the tabs of all and followed authors to logged in users."""
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string(
+        'posts/includes/switcher.html',
+        {'active': active},
+        request=request
+    )
@@ -0,0 +1,185 @@
+import base64
+import logging
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGE_SIDE = 1920  # bigger images are scaled down to it
+MAX_IMAGE_PIXELS = 50_000_000  # bigger ones are rejected before decoding
+MAX_IMAGE_BYTES = 1024 * 1024  # size budget of a stored image
+JPEG_QUALITIES = (85, 75, 65, 50)  # tried in turn to fit the budget
+KEPT_FORMATS = ('JPEG', 'PNG', 'GIF')  # stored as they are if they fit
+ORIENTATION_TAG = 0x0112
+PLACEHOLDER_SIDE = 16  # pixels of the inline placeholder, blurred by scaling
+
+
+def ingest_image(upload):
+    """Returns the uploaded image fit for storing, or raises
+    ValidationError.
+
+    Sizes are read from the header, so decompression bombs are rejected
+    before they are decoded. An image which fits the limits is stored
+    as it is, others are scaled down, turned upright and encoded again
+    into a spooled file, which goes to disk once it gets big.
+    """
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (Image.DecompressionBombError, OSError):
+        raise ValidationError(
+            'Изображение слишком большое.', code='image_too_big'
+        )
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            'Изображение слишком большое: %(width)s×%(height)s.',
+            code='image_too_big',
+            params={'width': width, 'height': height}
+        )
+    if not _needs_encoding(image, upload.size):
+        upload.seek(0)
+        return upload
+    if getattr(image, 'n_frames', 1) > 1:
+        raise ValidationError(
+            'Анимация должна быть не больше %(side)s пикселей '
+            'и %(size)s КБ.',
+            code='animation_too_big',
+            params={'side': MAX_IMAGE_SIDE, 'size': MAX_IMAGE_BYTES // 1024}
+        )
+    return _encode(image, upload.name)
+
+
+def _needs_encoding(image, size):
+    return (
+        image.format not in KEPT_FORMATS
+        or max(image.size) > MAX_IMAGE_SIDE
+        or size > MAX_IMAGE_BYTES
+        or image.getexif().get(ORIENTATION_TAG, 1) != 1
+    )
+
+
+def _encode(image, name):
+    # JPEG is decoded right at a fraction of its size
+    image.draft('RGB', (MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.LANCZOS)
+    transparent = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    if transparent:
+        image.convert('RGBA').save(output, 'PNG', optimize=True)
+        extension, content_type = '.png', 'image/png'
+    else:
+        image = image.convert('RGB')
+        for quality in JPEG_QUALITIES:
+            output.seek(0)
+            output.truncate()
+            image.save(
+                output, 'JPEG', quality=quality,
+                optimize=True, progressive=True
+            )
+            if output.tell() <= MAX_IMAGE_BYTES:
+                break
+        extension, content_type = '.jpg', 'image/jpeg'
+    size = output.tell()
+    if size > MAX_IMAGE_BYTES:
+        output.close()
+        raise ValidationError(
+            'Изображение не удалось сжать до %(size)s КБ.',
+            code='image_too_heavy',
+            params={'size': MAX_IMAGE_BYTES // 1024}
+        )
+    output.seek(0)
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return UploadedFile(output, stem + extension, content_type, size)
+
+
+def image_size(file):
+    """Returns the width and the height of the image read from its
+    header, or None if it is not readable.
+    """
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            return image.size
+    except (OSError, ValueError):
+        return None
+    finally:
+        file.seek(0)
+
+
+def placeholder(file):
+    """Returns a tiny copy of the image as a data URI, which pages show
+    scaled up instead of the image until it is loaded, or an empty
+    string if the image is not readable.
+
+    JPEG is decoded right at a fraction of its size, so it is cheap
+    enough to make while the post is saved.
+    """
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            image.draft('RGB', (PLACEHOLDER_SIDE, PLACEHOLDER_SIDE))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((PLACEHOLDER_SIDE, PLACEHOLDER_SIDE))
+            output = BytesIO()
+            image.convert('RGB').save(output, 'PNG', optimize=True)
+    except (OSError, ValueError):
+        return ''
+    finally:
+        file.seek(0)
+    data = base64.b64encode(output.getvalue()).decode()
+    return f'data:image/png;base64,{data}'
+
+
+def image_fields(file):
+    """Returns the size and the placeholder of the image as fields
+    of its posts.
+    """
+    width, height = image_size(file) or (None, None)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_placeholder': placeholder(file),
+    }
+
+
+def release_image(name):
+    """Deletes the stored image and its thumbnails once the transaction
+    is committed, if no post uses the file anymore.
+
+    Identical uploads share one file, so posts are counted by a query
+    rather than the file being deleted with its post. A file claimed by
+    a recent upload is left to the clean_media command, as the post
+    saved with it may not be committed yet.
+    """
+    if name:
+        transaction.on_commit(lambda: _delete_unused(name))
+
+
+def _delete_unused(name):
+    try:
+        with default_storage.locked():
+            if (Post.objects.filter(image=name).exists()
+                    or default_storage.is_claimed(name)):
+                return
+            delete(ImageFile(name, default_storage))
+    except SuspiciousFileOperation:
+        # Posts may refer to files outside the media, which are not ours
+        logger.warning('Not deleting %s outside the media', name)
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from posts.cache import bump
+from posts.views import index
+
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends storms of simultaneous requests to the index right after '
+        'its cached page is outdated, and prints the database queries '
+        'they run without the page cache and with it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--storms', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"cache":>9} {"queries":>8} {"queries/s":>10} {"storm ms":>9}'
+        )
+        with override_settings(CACHES=DUMMY_CACHES):
+            row = self.run_storms('off', options)
+        self.stdout.write('{:>9} {:>8} {:>10.0f} {:>9.1f}'.format(*row))
+        self.request()
+        row = self.run_storms('on', options)
+        self.stdout.write('{:>9} {:>8} {:>10.0f} {:>9.1f}'.format(*row))
+
+    def run_storms(self, mode, options):
+        queries = 0
+        elapsed = 0
+        for _ in range(options['storms']):
+            bump('posts')
+            storm_queries, storm_time = self.storm(options['requests'])
+            queries += storm_queries
+            elapsed += storm_time
+        return (
+            mode,
+            queries,
+            queries / elapsed,
+            elapsed / options['storms'] * 1000,
+        )
+
+    def storm(self, size):
+        """Requests the index from all threads at once."""
+        barrier = threading.Barrier(size)
+        lock = threading.Lock()
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            with lock:
+                queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def run():
+            barrier.wait()
+            try:
+                with connection.execute_wrapper(count):
+                    self.request()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run) for _ in range(size)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(queries), time.perf_counter() - started
+
+    def request(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        return index(request)
@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+
+from posts.feed import feed_posts
+from posts.models import Post, Follow, FeedEntry
+
+User = get_user_model()
+FEED_PAGE_SIZE = 10
+# Posts bump generations of never expiring keys, which the rollback
+# would leave behind in the shared cache
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark_feed',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares write amplification and feed read latency of the '
+        'hybrid feed for several pull thresholds on a synthetic follow '
+        'graph. All the data is rolled back afterwards, and the shared '
+        'cache and the caching proxy are left alone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument('--readers', type=int, default=100)
+        parser.add_argument(
+            '--thresholds',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000, 100000]
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"threshold":>10} {"entries/post":>13} {"write ms":>9} '
+            f'{"read p50 ms":>12} {"read p95 ms":>12}'
+        )
+        for threshold in options['thresholds']:
+            with override_settings(
+                FEED_PULL_FOLLOWERS_THRESHOLD=threshold,
+                CACHES=BENCHMARK_CACHES,
+                EDGE_PURGER='core.purge.NullPurger'
+            ):
+                row = self.run_once(threshold, options)
+            self.stdout.write(
+                '{:>10} {:>13.1f} {:>9.2f} {:>12.2f} {:>12.2f}'.format(*row)
+            )
+
+    def run_once(self, threshold, options):
+        rnd = random.Random(options['seed'])
+        with transaction.atomic():
+            users = self.build_graph(rnd, options['users'], threshold)
+            entries_before = FeedEntry.objects.count()
+            started = time.perf_counter()
+            for _ in range(options['posts']):
+                Post.objects.create(
+                    author_id=rnd.choice(users),
+                    text='Benchmark post'
+                )
+            write_ms = (time.perf_counter() - started) * 1000
+            entries = FeedEntry.objects.count() - entries_before
+            timings = []
+            readers = min(len(users), options['readers'])
+            for user_id in rnd.sample(users, readers):
+                started = time.perf_counter()
+                list(feed_posts(User(pk=user_id))[:FEED_PAGE_SIZE])
+                timings.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+        timings.sort()
+        return (
+            threshold,
+            entries / options['posts'],
+            write_ms / options['posts'],
+            statistics.median(timings),
+            timings[int(len(timings) * 0.95) - 1],
+        )
+
+    def build_graph(self, rnd, size, threshold):
+        """Creates users whose popularity follows a power law."""
+        prefix = f'bench{rnd.getrandbits(32)}_'
+        User.objects.bulk_create(
+            User(username=f'{prefix}{i}') for i in range(size)
+        )
+        users = list(
+            User.objects.filter(
+                username__startswith=prefix
+            ).values_list('pk', flat=True)
+        )
+        follows = []
+        for rank, author in enumerate(users, start=1):
+            followers = rnd.sample(users, min(size, size // rank))
+            follows.extend(
+                Follow(user_id=user, author_id=author)
+                for user in followers if user != author
+            )
+        Follow.objects.bulk_create(follows)
+        pull_authors = Follow.objects.filter(
+            author_id__in=users
+        ).values('author_id').annotate(
+            followers=Count('pk')
+        ).filter(followers__gt=threshold).values('author_id')
+        Follow.objects.filter(author_id__in=pull_authors).update(pull=True)
+        return users
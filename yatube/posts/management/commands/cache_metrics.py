@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Prints hits, misses and bytes of the shared caches, added up by '
+        'all the workers which used them.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"cache":<10} {"hits":>10} {"misses":>10} {"hit %":>6} '
+            f'{"sets":>10} {"read KB":>10} {"written KB":>10}'
+        )
+        for alias in settings.CACHES:
+            cache = caches[alias]
+            if not hasattr(cache, 'read_metrics'):
+                continue
+            metrics = cache.read_metrics()
+            reads = metrics['hits'] + metrics['misses']
+            self.stdout.write(
+                f'{alias:<10} {metrics["hits"]:>10} {metrics["misses"]:>10} '
+                f'{100 * metrics["hits"] / (reads or 1):>6.1f} '
+                f'{metrics["sets"]:>10} '
+                f'{metrics["bytes_read"] / 1024:>10.1f} '
+                f'{metrics["bytes_written"] / 1024:>10.1f}'
+            )
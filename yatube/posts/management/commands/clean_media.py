@@ -0,0 +1,123 @@
+import os
+import time
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default, delete
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core.storage import CLAIM_TIMEOUT, iter_files
+from posts.models import Post
+
+UPLOAD_DIRECTORY = 'posts'
+
+
+class Command(BaseCommand):
+    help = (
+        'Finds post images no post uses and thumbnails sorl does not '
+        'know of, then reports or deletes them. Directories are read as '
+        'a stream and checked against the database in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report orphans without deleting them.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--min-age', type=int, default=CLAIM_TIMEOUT,
+            help='Seconds a file is kept for the post being saved with it.'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        min_mtime = time.time() - options['min_age']
+        started = time.monotonic()
+        scanned = orphans = freed = 0
+        for directory, find_orphans, remove in (
+            (UPLOAD_DIRECTORY, self.unused_images, self.delete_image),
+            (
+                thumbnail_settings.THUMBNAIL_PREFIX.strip('/'),
+                self.unknown_thumbnails,
+                self.delete_thumbnail,
+            ),
+        ):
+            root = default_storage.path(directory)
+            if not os.path.isdir(root):
+                continue
+            files = self.old_files(root, directory, min_mtime)
+            while True:
+                batch = dict(islice(files, options['batch_size']))
+                if not batch:
+                    break
+                scanned += len(batch)
+                for name in find_orphans(list(batch)):
+                    if not dry_run and not remove(name):
+                        continue
+                    orphans += 1
+                    freed += batch[name]
+                    if options['verbosity'] > 1:
+                        self.stdout.write(name)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{"Found" if dry_run else "Deleted"} {orphans} orphans '
+            f'of {scanned} files, {freed} bytes, in {elapsed:.1f}s '
+            f'({scanned / max(elapsed, 1e-6):.0f} files/s)'
+        )
+
+    @staticmethod
+    def old_files(root, directory, min_mtime):
+        """Yields storage names and sizes of the files older than
+        min_mtime, which are not being saved anymore.
+        """
+        for entry in iter_files(root):
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime <= min_mtime:
+                relative = os.path.relpath(entry.path, root)
+                name = f'{directory}/{relative}'.replace(os.sep, '/')
+                yield name, stat.st_size
+
+    @staticmethod
+    def unused_images(names):
+        used = set(
+            Post.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        )
+        return [name for name in names if name not in used]
+
+    @staticmethod
+    def unknown_thumbnails(names):
+        keys = {
+            add_prefix(ImageFile(name, default.storage).key): name
+            for name in names
+        }
+        known = set(
+            KVStore.objects.filter(key__in=keys).values_list(
+                'key', flat=True
+            )
+        )
+        return [name for key, name in keys.items() if key not in known]
+
+    @staticmethod
+    def delete_image(name):
+        """Deletes the image with its thumbnails, unless an upload has
+        reused it since it was listed.
+        """
+        with default_storage.locked():
+            if (default_storage.is_claimed(name)
+                    or Post.objects.filter(image=name).exists()):
+                return False
+            delete(ImageFile(name, default_storage))
+        return True
+
+    @staticmethod
+    def delete_thumbnail(name):
+        default.storage.delete(name)
+        return True
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from core.storage import iter_files
+from posts.cache import NAMES_SCOPE, bump
+from posts.models import Post
+from posts.rendering import rerender_posts
+
+UPLOAD_DIRECTORY = 'posts'
+# Names given by the content addressed storage, relative to the directory
+CONTENT_NAME = re.compile(r'^(?P<shard>[0-9a-f]{2})/(?P=shard)[0-9a-f]{62}')
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves post images stored under their upload names to names by '
+        'content, so that identical files are kept once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the files to merge without changing anything.'
+        )
+
+    def handle(self, *args, **options):
+        root = default_storage.path(UPLOAD_DIRECTORY)
+        if not os.path.isdir(root):
+            self.stdout.write('No files to deduplicate')
+            return
+        moved = merged = freed = 0
+        # Files a dry run would have moved, which a real one finds stored
+        planned = set()
+        updated = []
+        for entry in iter_files(root):
+            relative = os.path.relpath(entry.path, root).replace(os.sep, '/')
+            if CONTENT_NAME.match(relative):
+                continue
+            name = f'{UPLOAD_DIRECTORY}/{relative}'
+            target = self.content_name(entry.path)
+            duplicate = target in planned or default_storage.exists(target)
+            size = entry.stat(follow_symlinks=False).st_size
+            if options['dry_run']:
+                planned.add(target)
+            else:
+                if not duplicate:
+                    path = default_storage.path(target)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(entry.path, path)
+                posts = Post.objects.filter(image=name)
+                updated.extend(posts.values_list('pk', flat=True))
+                posts.update(image=target)
+                # Thumbnails of the old name, and the file if it is a copy
+                delete(ImageFile(name, default_storage))
+            moved += 1
+            if duplicate:
+                merged += 1
+                freed += size
+        if updated:
+            rerender_posts(Post.objects.filter(pk__in=updated))
+            bump(NAMES_SCOPE)
+        self.stdout.write(
+            f'{"Would move" if options["dry_run"] else "Moved"} '
+            f'{moved} files, {merged} duplicates, {freed} bytes freed'
+        )
+
+    @staticmethod
+    def content_name(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return default_storage.content_name(
+            UPLOAD_DIRECTORY,
+            digest.hexdigest(),
+            os.path.splitext(path)[1].lower()
+        )
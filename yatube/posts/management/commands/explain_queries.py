@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from posts.models import Post, Follow
+
+User = get_user_model()
+# Plan steps which read a whole table or sort rows without an index
+FULL_SCAN_MARKERS = ('USE TEMP B-TREE',)
+
+
+def is_full_scan(step):
+    """Checks if a step of SQLite query plan reads without an index."""
+    if step.startswith('SCAN') and 'USING' not in step:
+        return True
+    return any(marker in step for marker in FULL_SCAN_MARKERS)
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests every post listing and post detail page, prints the '
+        'query plan of each SELECT they run and marks full scans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Exit with an error if any query reads without an index.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Query plans are read from SQLite only.')
+        post = Post.objects.exclude(group=None).first()
+        follow = Follow.objects.first()
+        if post is None or follow is None:
+            raise CommandError(
+                'A post with a group and a subscription are needed.'
+            )
+        client = Client()
+        client.force_login(follow.user)
+        pages = (
+            ('index', []),
+            ('group_list', [post.group.slug]),
+            ('profile', [post.author.username]),
+            ('post_detail', [post.pk]),
+            ('follow_index', []),
+        )
+        urls = [(name, reverse(f'posts:{name}', args=args))
+                for name, args in pages]
+        urls.append(('index, page 2', reverse('posts:index') + '?page=2'))
+        scans = 0
+        for name, url in urls:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: {url}'))
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+            }}):
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+            for query in queries:
+                if query['sql'].startswith('SELECT'):
+                    scans += self.explain(query['sql'])
+        if scans and options['fail_on_scan']:
+            raise CommandError(f'{scans} queries read without an index.')
+
+    def explain(self, sql):
+        """Prints the plan of the query, returns 1 if it has a full scan."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            steps = [row[-1] for row in cursor.fetchall()]
+        full_scan = any(is_full_scan(step) for step in steps)
+        style = self.style.ERROR if full_scan else self.style.SQL_FIELD
+        self.stdout.write(style(sql))
+        for step in steps:
+            marker = '!' if is_full_scan(step) else ' '
+            self.stdout.write(f'  {marker} {step}')
+        return int(full_scan)
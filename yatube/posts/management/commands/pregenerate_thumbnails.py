@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.cache import NAMES_SCOPE, bump
+from posts.images import image_fields
+from posts.models import Post
+from posts.rendering import rerender_posts
+from posts.thumbnails import generate_thumbnails, has_thumbnails
+
+BATCH_SIZE = 500  # image names looked up at once
+
+
+def _generate(name):
+    """Makes thumbnails and the placeholder of one image in a worker
+    process, returns the error instead of raising it, so one broken file
+    does not stop all.
+    """
+    try:
+        # Names alone would be looked up in the thumbnail storage
+        generate_thumbnails(ImageFile(name, default_storage))
+        with default_storage.open(name) as file:
+            return name, image_fields(file), None
+    except Exception as error:
+        return name, None, error
+
+
+class Command(BaseCommand):
+    help = (
+        'Makes thumbnails and placeholders of every post image in a pool '
+        'of processes, then renders the posts with them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Processes resizing images.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=16,
+            help='Images sent to a process at once.'
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help=(
+                'Make only images with no thumbnails, such as those of '
+                'jobs lost with a stopped process.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True
+            ).distinct()
+        )
+        if options['missing']:
+            names = self.missing(names)
+        # Worker processes are forked, they must not share a connection
+        connections.close_all()
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            results = pool.map(
+                _generate, names, chunksize=options['chunk_size']
+            )
+            for name, fields, error in results:
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                else:
+                    Post.objects.filter(image=name).update(**fields)
+        rendered = 0
+        if options['missing']:
+            for start in range(0, len(names), BATCH_SIZE):
+                rendered += rerender_posts(Post.objects.filter(
+                    image__in=names[start:start + BATCH_SIZE]
+                ))
+        else:
+            rendered = rerender_posts(Post.objects.exclude(image=''))
+        bump(NAMES_SCOPE)
+        self.stdout.write(
+            f'Made thumbnails of {len(names) - failed} images, '
+            f'{failed} failed, rendered {rendered} posts'
+        )
+
+    @staticmethod
+    def missing(names):
+        missing = []
+        for start in range(0, len(names), BATCH_SIZE):
+            images = [
+                ImageFile(name, default_storage)
+                for name in names[start:start + BATCH_SIZE]
+            ]
+            with default.kvstore.prefetched(images):
+                missing.extend(
+                    image.name for image in images
+                    if not has_thumbnails(image)
+                )
+        return missing
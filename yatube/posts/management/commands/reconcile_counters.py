@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount_groups, recount_posts, recount_users
+from posts.models import Post, Group
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Recounts denormalized counters of groups, posts and users '
+        'in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for name, model, recount in (
+            ('groups', Group, recount_groups),
+            ('posts', Post, recount_posts),
+            ('users', User, recount_users),
+        ):
+            updated = 0
+            for pks in self.batches(model, batch_size):
+                with transaction.atomic():
+                    updated += recount(pks)
+            self.stdout.write(f'Recounted {updated} {name}')
+
+    @staticmethod
+    def batches(model, size):
+        """Yields primary keys of the model in ascending batches."""
+        last = None
+        rows = model.objects.order_by('pk').values_list('pk', flat=True)
+        while True:
+            batch = list(
+                (rows if last is None else rows.filter(pk__gt=last))[:size]
+            )
+            if not batch:
+                return
+            yield batch
+            last = batch[-1]
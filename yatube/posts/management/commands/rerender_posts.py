@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import NAMES_SCOPE, bump
+from posts.models import Post
+from posts.rendering import RENDER_BATCH_SIZE, rerender_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders stored HTML of all posts again, after their templates '
+        'are changed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=RENDER_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Render only posts which have no HTML yet.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if options['missing']:
+            posts = posts.filter(card_html='')
+        rendered = rerender_posts(posts, options['batch_size'])
+        bump(NAMES_SCOPE)
+        self.stdout.write(f'Rendered {rendered} posts')
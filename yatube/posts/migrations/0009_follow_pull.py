@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def mark_pull_authors(apps, schema_editor):
+    """Switches authors with too many followers to pull mode."""
+    Follow = apps.get_model('posts', 'Follow')
+    authors = Follow.objects.values('author_id').annotate(
+        followers=Count('pk')
+    ).filter(
+        followers__gt=settings.FEED_PULL_FOLLOWERS_THRESHOLD
+    ).values('author_id')
+    Follow.objects.filter(author_id__in=authors).update(pull=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='pull',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_pull_authors, migrations.RunPython.noop),
+    ]
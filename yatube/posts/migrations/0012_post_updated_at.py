@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:26
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def date_versions(apps, schema_editor):
+    """Dates existing posts by their publication."""
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated_at=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(date_versions, migrations.RunPython.noop),
+    ]
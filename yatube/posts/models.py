@@ -11,6 +11,8 @@ class Post(models.Model):
 
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
+    # Version of the post for the caches of its rendered HTML
+    updated_at = models.DateTimeField(auto_now=True)
     group = models.ForeignKey(
         'Group',
         blank=True,
@@ -24,20 +26,56 @@ class Post(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Автор'
     )
+    # Files are named by content and shared by identical uploads, see
+    # core.storage, the index counts the posts using a file
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        blank=True,
+        db_index=True
     )
+    # Read from the image when it is saved, see posts.images, so pages
+    # reserve its place and show a placeholder while it is loaded
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # HTML rendered on save, see posts.rendering
+    card_html = models.TextField(blank=True, editable=False)
+    body_html = models.TextField(blank=True, editable=False)
 
     def __str__(self):
         return self.text[:MAX_TEXT_DISPLAYED]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembers the group to move the post counter if it is changed
+        if 'group_id' in instance.__dict__:
+            instance.loaded_group_id = instance.group_id
+        # and the image to release its file if it is replaced
+        if 'image' in instance.__dict__:
+            instance.loaded_image = instance.__dict__['image']
+        return instance
+
     class Meta:
         ordering = ('-pub_date',)
         default_related_name = 'posts'
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Listings go backwards by (pub_date, id), which SQLite keeps
+        # in every index as the rowid goes last
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
 
 class Group(models.Model):
@@ -46,6 +84,7 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField(max_length=200)
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
@@ -67,6 +106,12 @@ class Comment(models.Model):
     class Meta:
         ordering = ('-created',)
         default_related_name = 'comments'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:MAX_TEXT_DISPLAYED]
@@ -83,6 +128,9 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE
     )
+    # Posts of authors with too many followers are read at request time
+    # instead of being pushed into every follower's feed
+    pull = models.BooleanField(default=False)
 
     def __str__(self):
         return f'{self.user.id} is following {self.author.id}'
@@ -94,3 +142,66 @@ class Follow(models.Model):
                 name='unique_following'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Denormalized counters of a user."""
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Counters of {self.user_id}'
+
+
+class FeedEntry(models.Model):
+    """Materialized post of a followed author in user's subscription feed."""
+
+    user = models.ForeignKey(
+        User,
+        related_name='feed',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    # Copies of post fields, so the feed is pruned and ordered without joins
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.post_id} in feed of {self.user_id}'
+
+    class Meta:
+        ordering = ('-pub_date',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='feed_user_pub_date_post_idx'
+            ),
+        ]
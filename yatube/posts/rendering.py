@@ -0,0 +1,80 @@
+from django.template.loader import render_to_string
+from sorl.thumbnail import default
+
+from .cache import NAMES_SCOPE, bump
+from .models import Post
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+BODY_TEMPLATE = 'posts/includes/post_body.html'
+EXCERPT_CHARS = 300  # post text shown on a card, ellipsis included
+RENDER_BATCH_SIZE = 500  # the number of posts rendered and saved at once
+# Fields of authors and groups which cards render
+USER_NAMES = ('username', 'first_name', 'last_name')
+GROUP_NAMES = ('slug', 'title')
+
+
+def render_post(post, thumbnails=True):
+    """Renders the card and the body of the post into its fields.
+
+    Without thumbnails the image is linked as it is, so that rendering
+    does not resize it while posts.thumbnails makes the thumbnails.
+    """
+    context = {'post': post, 'thumbnails_pending': not thumbnails}
+    post.card_html = render_to_string(
+        CARD_TEMPLATE,
+        {**context, 'excerpt_chars': EXCERPT_CHARS}
+    )
+    post.body_html = render_to_string(BODY_TEMPLATE, context)
+
+
+def store_rendered(post, thumbnails=True):
+    """Renders the post and saves the HTML without touching its version."""
+    render_post(post, thumbnails)
+    Post.objects.filter(pk=post.pk).update(
+        card_html=post.card_html,
+        body_html=post.body_html
+    )
+
+
+def render_posts(posts):
+    """Renders and saves HTML of a batch of posts, returns them.
+
+    Thumbnails of the batch are looked up at once.
+    """
+    posts = list(posts)
+    with default.kvstore.prefetched(post.image for post in posts):
+        for post in posts:
+            render_post(post)
+    Post.objects.bulk_update(posts, ['card_html', 'body_html'])
+    return posts
+
+
+def rerender_posts(posts, batch_size=RENDER_BATCH_SIZE):
+    """Renders HTML of all the posts in batches, returns their number.
+
+    Batches go by primary keys, so the posts are never held at once.
+    """
+    posts = posts.select_related('author', 'group').order_by('pk')
+    rendered = 0
+    last = None
+    while True:
+        batch = (posts if last is None else posts.filter(pk__gt=last))
+        batch = render_posts(batch[:batch_size])
+        if not batch:
+            return rendered
+        rendered += len(batch)
+        last = batch[-1].pk
+
+
+def rerender_names(scope, pk, post_pks=None):
+    """Renders posts of a renamed author or group, or the posts listed of
+    a deleted group, then drops the cached pages showing the names.
+    """
+    if post_pks is not None:
+        posts = Post.objects.filter(pk__in=post_pks)
+    elif scope == 'author':
+        posts = Post.objects.filter(author_id=pk)
+    else:
+        posts = Post.objects.filter(group_id=pk)
+    rerender_posts(posts)
+    bump(NAMES_SCOPE, f'{scope}:{pk}')
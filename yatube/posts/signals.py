@@ -0,0 +1,225 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    pre_save, post_save, pre_delete, post_delete
+)
+from django.dispatch import receiver
+
+from core.background import run_in_background
+from .cache import bump, post_scopes
+from .counters import (
+    change_post_comments, count_follow, count_post, move_post
+)
+from .feed import fan_out_post, backfill_feed, prune_feed
+from .images import image_fields, release_image
+from .models import Post, Group, Comment, Follow, UserStats
+from .rendering import GROUP_NAMES, USER_NAMES, rerender_names, store_rendered
+from .thumbnails import pregenerate_thumbnails
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    """Starts counters of a new user."""
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_loaded_fields(sender, instance, **kwargs):
+    """Reads the group a post is moved from and the image it is saved
+    over, unless they were loaded.
+    """
+    if instance.pk is None or (
+        hasattr(instance, 'loaded_group_id')
+        and hasattr(instance, 'loaded_image')
+    ):
+        return
+    instance.loaded_group_id, instance.loaded_image = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', 'image').first() or (None, None)
+
+
+@receiver(pre_save, sender=Post)
+def remember_new_image(sender, instance, **kwargs):
+    """Marks a post which gets a new upload and reads its size and its
+    placeholder from the open upload, before it is stored, so that the
+    post shows the placeholder while its thumbnails are made.
+    """
+    instance.image_uploaded = (
+        bool(instance.image) and not instance.image._committed
+    )
+    if instance.image_uploaded:
+        for name, value in image_fields(instance.image.file).items():
+            setattr(instance, name, value)
+    elif not instance.image:
+        instance.image_width = instance.image_height = None
+        instance.image_placeholder = ''
+
+
+def _loaded_names(model, instance, fields):
+    """Reads the fields which cards render, as they are stored."""
+    if instance.pk is None:
+        return None
+    return model.objects.filter(pk=instance.pk).values_list(
+        *fields
+    ).first()
+
+
+@receiver(pre_save, sender=User)
+def remember_user_names(sender, instance, update_fields, **kwargs):
+    """Reads the names of a user before they are saved, but not on
+    login, which saves nothing else.
+    """
+    if update_fields != frozenset({'last_login'}):
+        instance.loaded_names = _loaded_names(User, instance, USER_NAMES)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created, **kwargs):
+    """Re-renders cards and drops cached pages showing the user's name,
+    once it is changed.
+    """
+    if created:
+        bump(f'author:{instance.pk}')
+        return
+    loaded_names = getattr(instance, 'loaded_names', None)
+    names = tuple(getattr(instance, name) for name in USER_NAMES)
+    if loaded_names is not None and loaded_names != names:
+        run_in_background(rerender_names, 'author', instance.pk)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_names(sender, instance, **kwargs):
+    instance.loaded_names = _loaded_names(Group, instance, GROUP_NAMES)
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_pages(sender, instance, created, **kwargs):
+    """Drops cached pages of the group, and re-renders cards, which link
+    groups, once the group is renamed.
+    """
+    bump(f'group:{instance.pk}')
+    if created:
+        return
+    loaded_names = getattr(instance, 'loaded_names', None)
+    names = tuple(getattr(instance, name) for name in GROUP_NAMES)
+    if loaded_names is not None and loaded_names != names:
+        run_in_background(rerender_names, 'group', instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    """Reads posts of a deleted group, which lose it before post_delete."""
+    instance.post_pks = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group_pages(sender, instance, **kwargs):
+    run_in_background(
+        rerender_names, 'group', instance.pk, instance.post_pks
+    )
+
+
+@receiver(post_save, sender=Post)
+def render_saved_post(sender, instance, **kwargs):
+    """Renders HTML of the post once it is written, not on every read.
+
+    Thumbnails of a new image are made in the background, the post
+    links the image as it is until then.
+    """
+    if getattr(instance, 'image_uploaded', False):
+        store_rendered(instance, thumbnails=False)
+        pregenerate_thumbnails(instance)
+    else:
+        store_rendered(instance)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    """Deletes the file of a replaced or cleared image nothing else uses."""
+    loaded_image = getattr(instance, 'loaded_image', None)
+    if loaded_image and loaded_image != instance.image.name:
+        release_image(loaded_image)
+    instance.loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    """Drops cached pages listing the post, in the old group too."""
+    scopes = post_scopes(instance)
+    loaded_group_id = getattr(instance, 'loaded_group_id', None)
+    if loaded_group_id is not None:
+        scopes.add(f'group:{loaded_group_id}')
+    bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    """Drops the cached feed and the counters of both profiles."""
+    bump(
+        f'feed:{instance.user_id}',
+        f'author:{instance.author_id}',
+        f'author:{instance.user_id}',
+    )
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_feeds(sender, instance, created, **kwargs):
+    """Fills followers' feeds when a post is published."""
+    if created:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    """Counts a new post and moves it between groups' counters."""
+    if created:
+        count_post(instance.author_id, instance.group_id, 1)
+    elif instance.loaded_group_id != instance.group_id:
+        move_post(instance.loaded_group_id, instance.group_id)
+    instance.loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    count_post(instance.author_id, instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        change_post_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_post_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def fill_feed_on_follow(sender, instance, created, **kwargs):
+    """Backfills user's feed with posts of a followed author."""
+    if created:
+        backfill_feed(instance)
+        count_follow(instance.user_id, instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed_on_unfollow(sender, instance, **kwargs):
+    """Removes posts of an unfollowed author from user's feed."""
+    prune_feed(instance)
+    count_follow(instance.user_id, instance.author_id, -1)
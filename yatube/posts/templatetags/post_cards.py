@@ -0,0 +1,31 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.models import Post
+from posts.rendering import render_posts
+
+register = template.Library()
+
+
+@register.simple_tag
+def render_cards(posts):
+    """Returns HTML cards of the posts, stored when they were saved.
+
+    Posts which have none yet, like the ones created in bulk, are
+    loaded in full at once, rendered and saved.
+    """
+    posts = list(posts)
+    missing = [post.pk for post in posts if not post.card_html]
+    if missing:
+        rendered = {
+            post.pk: post.card_html
+            for post in render_posts(
+                Post.objects.filter(
+                    pk__in=missing
+                ).select_related('author', 'group')
+            )
+        }
+        for post in posts:
+            if not post.card_html:
+                post.card_html = rendered[post.pk]
+    return [mark_safe(post.card_html) for post in posts]
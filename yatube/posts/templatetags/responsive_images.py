@@ -0,0 +1,86 @@
+import logging
+
+from django import template
+from django.utils.html import format_html
+from sorl.thumbnail import get_thumbnail
+
+from posts.thumbnails import THUMBNAILS
+
+logger = logging.getLogger(__name__)
+register = template.Library()
+
+# Cards take the whole width of the page up to the widest variant
+IMAGE_SIZES = '(max-width: 992px) 100vw, 960px'
+
+
+@register.simple_tag
+def responsive_image(image, pending=False, width=None, height=None,
+                     placeholder='', sizes=IMAGE_SIZES,
+                     css_class='card-img my-2', alt=''):
+    """Returns the img tag of the image with its width variants.
+
+    Browsers load the variant which fits the screen, and only once the
+    image is close to the viewport. The size of the widest variant is
+    set, so the page does not shift when it is loaded, and the inline
+    placeholder is shown meanwhile.
+
+    A pending image has no variants yet and is shown as it is, sized by
+    the width and the height read on save, or cut to the variants' size,
+    over the placeholder made on save.
+    """
+    if not image:
+        return ''
+    if pending:
+        if width and height:
+            return format_html(
+                '<img class="{}" src="{}" width="{}" height="{}" alt="{}"'
+                '{} loading="lazy" decoding="async">',
+                css_class, image.url, width, height, alt,
+                _style('', placeholder)
+            )
+        width, height = _size(THUMBNAILS[-1][0])
+        return format_html(
+            '<img class="{}" src="{}" width="{}" height="{}" alt="{}"'
+            '{} loading="lazy" decoding="async">',
+            css_class, image.url, width, height, alt,
+            _style('object-fit: cover', placeholder)
+        )
+    try:
+        variants = [
+            (get_thumbnail(image, geometry, **options),
+             _size(geometry)[0])
+            for geometry, options in THUMBNAILS
+        ]
+    except Exception:
+        logger.exception('Could not make thumbnails of %s', image)
+        return ''
+    width, height = _size(THUMBNAILS[-1][0])
+    return format_html(
+        '<img class="{}" src="{}" srcset="{}" sizes="{}" width="{}" '
+        'height="{}" alt="{}"{} loading="lazy" decoding="async">',
+        css_class,
+        variants[-1][0].url,
+        ', '.join(f'{variant.url} {width}w' for variant, width in variants),
+        sizes, width, height, alt, _style('', placeholder)
+    )
+
+
+def _style(style, placeholder):
+    """Returns the style attribute showing the placeholder behind the
+    image, or the given style alone.
+    """
+    if placeholder:
+        background = format_html(
+            'background: url({}) center / cover no-repeat', placeholder
+        )
+        if style:
+            style = format_html('{}; {}', style, background)
+        else:
+            style = background
+    return format_html(' style="{}"', style) if style else ''
+
+
+def _size(geometry):
+    """Returns the width and the height of a cropped thumbnail."""
+    width, height = geometry.split('x')
+    return int(width), int(height)
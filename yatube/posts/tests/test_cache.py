@@ -0,0 +1,293 @@
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache import FileCache
+from ..cache import page_key, bump, _cached_response
+from ..models import Post, Group, Follow
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+        cls.post = Post.objects.create(author=cls.user, text='Старый текст')
+        cls.index = reverse('posts:index')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        self.client.get(self.index)
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Новый текст', card_html=''
+        )
+        bump('posts')
+        response = self.client.get(self.index)
+        self.key = page_key(response.wsgi_request, shared=True)
+
+    def test_stale_page_is_served_while_rendered(self):
+        """Check if an outdated page is served while it is locked, with
+        no validators and kept by no proxy.
+        """
+        bump('posts')
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Третий текст', card_html=''
+        )
+        cache.add(f'{self.key}:lock', 1)
+        stale = self.client.get(self.index)
+        self.assertContains(stale, 'Новый текст')
+        self.assertFalse(stale.has_header('ETag'))
+        self.assertFalse(stale.has_header('Last-Modified'))
+        self.assertFalse(stale.has_header('Surrogate-Key'))
+        self.assertIn('s-maxage=0', stale['Cache-Control'])
+        cache.delete(f'{self.key}:lock')
+        response = self.client.get(self.index)
+        self.assertContains(response, 'Третий текст')
+        self.assertTrue(response.has_header('Surrogate-Key'))
+        response = self.client.get(
+            self.index, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_page_is_rendered_after_waiting(self):
+        """Check if a locked page is rendered when nobody renders it."""
+        cache.delete(self.key)
+        cache.add(f'{self.key}:lock', 1)
+        with mock.patch('posts.cache.LOCK_WAIT', 0):
+            self.assertContains(self.client.get(self.index), 'Новый текст')
+
+    def test_page_is_refreshed_before_expiry(self):
+        """Check if a page close to its expiry is rendered early."""
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Третий текст', card_html=''
+        )
+        entry = cache.get(self.key)
+        self.assertContains(self.client.get(self.index), 'Новый текст')
+        entry['delta'] = entry['expires']
+        cache.set(self.key, entry)
+        self.assertContains(self.client.get(self.index), 'Третий текст')
+
+    def test_unknown_parameters_share_the_page(self):
+        """Check if only pagination parameters make a new cache entry."""
+        factory = RequestFactory()
+        key = page_key(factory.get(self.index), shared=True)
+        for params in ({'utm_source': 'x'}, {'junk': '1', 'other': '2'}):
+            with self.subTest(params=params):
+                request = factory.get(self.index, params)
+                self.assertEqual(page_key(request, shared=True), key)
+        for params in ({'page': '2'}, {'cursor': 'token'}):
+            with self.subTest(params=params):
+                request = factory.get(self.index, params)
+                self.assertNotEqual(page_key(request, shared=True), key)
+
+
+class PageLockTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.cache_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+
+    def setUp(self):
+        self.file_cache = FileCache(self.cache_dir, {})
+        self.file_cache.clear()
+        patcher = mock.patch('posts.cache.cache', self.file_cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_page_is_rendered_once(self):
+        """Check if concurrent requests for a missing page render it once
+        on the file cache.
+        """
+        renders = []
+        lock = threading.Lock()
+
+        def render_page():
+            with lock:
+                renders.append(1)
+            time.sleep(0.3)
+            return HttpResponse('Страница')
+
+        with ThreadPoolExecutor(8) as pool:
+            responses = list(pool.map(
+                lambda _: _cached_response('page', [1], render_page, False),
+                range(8)
+            ))
+        self.assertEqual(len(renders), 1)
+        for response in responses:
+            self.assertEqual(response.content.decode(), 'Страница')
+
+    def test_lock_of_another_request_is_kept(self):
+        """Check if a render which outlived its lock does not release the
+        lock another request took since.
+        """
+        def render_page():
+            self.file_cache.delete('page:lock')
+            self.file_cache.add('page:lock', 'other')
+            return HttpResponse('Страница')
+
+        _cached_response('page', [1], render_page, False)
+        self.assertEqual(self.file_cache.get('page:lock'), 'other')
+
+
+class SharedPageTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client(enforce_csrf_checks=True)
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_post_page_is_shared_by_users(self):
+        """Check if users get one cached post page with own fragments."""
+        edit = reverse('posts:post_edit', args=[self.post.pk])
+        guest = self.guest_client.get(self.url)
+        self.assertNotContains(guest, edit)
+        self.assertNotContains(guest, 'csrfmiddlewaretoken')
+        self.assertContains(guest, 'Войти')
+        with CaptureQueriesContext(connection) as queries:
+            author = self.author_client.get(self.url)
+        self.assertFalse(
+            any('posts_comment' in query['sql'] for query in queries)
+        )
+        self.assertContains(author, edit)
+        self.assertContains(author, 'csrfmiddlewaretoken')
+        self.assertContains(author, 'Пользователь: Author')
+        self.assertNotContains(author, '<!--fragment')
+        self.assertIn('csrftoken', author.cookies)
+        reader = self.reader_client.get(self.url)
+        self.assertNotContains(reader, edit)
+        self.assertContains(reader, 'Пользователь: Reader')
+
+    def test_index_tabs_are_shown_to_logged_in_users(self):
+        """Check if the shared index shows the tabs of followed authors
+        to logged in users only, whoever rendered it first.
+        """
+        index = reverse('posts:index')
+        follow = reverse('posts:follow_index')
+        self.assertNotContains(self.guest_client.get(index), follow)
+        self.assertContains(self.reader_client.get(index), follow)
+        cache.clear()
+        self.assertContains(self.reader_client.get(index), follow)
+        self.assertNotContains(self.guest_client.get(index), follow)
+
+    def test_stitched_form_is_accepted(self):
+        """Check if the comment form of a cached page can be sent."""
+        self.guest_client.get(self.url)
+        response = self.author_client.get(self.url)
+        token = response.cookies['csrftoken'].value
+        response = self.author_client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий', 'csrfmiddlewaretoken': token}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.post.comments.exists())
+
+    def test_new_csrf_token_changes_the_etag(self):
+        """Check if a page with a stitched form is sent again once the
+        CSRF token is rotated by a new login, and its form is accepted.
+        """
+        response = self.author_client.get(self.url)
+        etag = response['ETag']
+        self.author_client.cookies['csrftoken'] = 'x' * 64
+        response = self.author_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        token = response.context['csrf_token']
+        response = self.author_client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий', 'csrfmiddlewaretoken': str(token)}
+        )
+        self.assertEqual(response.status_code, 302)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+        cls.reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.group = Group.objects.create(slug='first', title='Первая')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Текст',
+            group=cls.group
+        )
+        cls.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_unchanged_pages_are_not_sent(self):
+        """Check if a page with the same ETag gets 304 without reading
+        posts, and a changed one is sent again.
+        """
+        for url in self.pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                etag = response['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(any(
+                    'FROM "posts_post"' in query['sql']
+                    and 'LIMIT' in query['sql']
+                    and '"posts_post"."id" =' not in query['sql']
+                    for query in queries
+                ))
+                Post.objects.create(
+                    author=self.user,
+                    text='Новый',
+                    group=self.group
+                )
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_pages_of_other_users_have_other_etags(self):
+        """Check if users never share an ETag of a page."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(Client().get(url)['ETag'], etag)
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, Group, Comment, Follow, UserStats
+
+User = get_user_model()
+
+
+class CounterTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group1 = Group.objects.create(slug='first', title='Первая')
+        cls.group2 = Group.objects.create(slug='second', title='Вторая')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group1
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCounters(self, obj, **counters):
+        obj.refresh_from_db()
+        for field, value in counters.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_post_counters(self):
+        """Check if posts are counted on create, move and delete."""
+        self.assertCounters(self.user.stats, posts_count=1)
+        self.assertCounters(self.group1, posts_count=1)
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.group2
+        post.save()
+        self.assertCounters(self.group1, posts_count=0)
+        self.assertCounters(self.group2, posts_count=1)
+        post.delete()
+        self.assertCounters(self.user.stats, posts_count=0)
+        self.assertCounters(self.group2, posts_count=0)
+
+    def test_comment_and_follow_counters(self):
+        """Check if comments and subscriptions are counted."""
+        comment = Comment.objects.create(
+            post=self.post,
+            author=self.reader,
+            text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertCounters(self.post, comments_count=1)
+        self.assertCounters(self.user.stats, followers_count=1)
+        self.assertCounters(self.reader.stats, following_count=1)
+        comment.delete()
+        Follow.objects.all().delete()
+        self.assertCounters(self.post, comments_count=0)
+        self.assertCounters(self.user.stats, followers_count=0)
+        self.assertCounters(self.reader.stats, following_count=0)
+
+    def test_reconcile_command_fixes_counters(self):
+        """Check if reconcile_counters recounts broken counters."""
+        Group.objects.update(posts_count=10)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.assertCounters(self.group1, posts_count=1)
+        self.assertCounters(self.group2, posts_count=0)
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+
+    def test_pages_do_not_count_posts(self):
+        """Check if profile and post_detail run no COUNT queries."""
+        client = Client()
+        for url in (
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertEqual(response.context['total_posts'], 1)
+                self.assertFalse(
+                    any('COUNT(' in query['sql'] for query in queries)
+                )
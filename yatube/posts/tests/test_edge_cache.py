@@ -0,0 +1,140 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, Client
+from django.test import override_settings
+from django.urls import reverse
+
+from ..models import Post, Group, Comment
+
+User = get_user_model()
+
+
+class PurgeHandler(BaseHTTPRequestHandler):
+    """Stands in for the caching proxy, records the keys it is asked
+    to purge.
+    """
+
+    def do_PURGE(self):
+        self.server.purged.append(self.headers['Surrogate-Key'].split())
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class EdgeHeadersTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+        cls.group = Group.objects.create(slug='first', title='Первая')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Текст',
+            group=cls.group
+        )
+        cls.pages = {
+            reverse('posts:index'): 'posts',
+            reverse('posts:group_list', args=[cls.group.slug]):
+                f'group:{cls.group.pk}',
+            reverse('posts:profile', args=[cls.user.username]):
+                f'author:{cls.user.pk}',
+            reverse('posts:post_detail', args=[cls.post.pk]):
+                f'post:{cls.post.pk}',
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_guest_pages_are_public(self):
+        """Check if guests' pages may be kept by the proxy and are tagged
+        with their surrogate keys.
+        """
+        for url, key in self.pages.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('s-maxage=', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                keys = response['Surrogate-Key'].split()
+                self.assertIn(key, keys)
+                self.assertIn('names', keys)
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('public', response['Cache-Control'])
+
+    def test_user_pages_are_private(self):
+        """Check if pages of logged in users are never kept by the proxy."""
+        pages = [*self.pages, reverse('posts:post_create')]
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertFalse(response.has_header('Surrogate-Key'))
+
+    def test_pages_setting_cookies_are_private(self):
+        """Check if a guest's page setting a cookie is not public."""
+        response = self.guest_client.get(reverse('users:login'))
+        self.assertIn('csrftoken', response.cookies)
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+
+
+class PurgeTests(TransactionTestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PurgeHandler)
+        cls.server.purged = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings = override_settings(
+            EDGE_PURGER='core.purge.HttpPurger',
+            EDGE_PURGE_URL='http://127.0.0.1:{}/'.format(
+                cls.server.server_port
+            ),
+        )
+        cls.settings.enable()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.settings.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='Testuser')
+        self.group = Group.objects.create(slug='first', title='Первая')
+        self.server.purged.clear()
+
+    def test_changes_purge_their_pages(self):
+        """Check if saved posts and comments purge the pages showing them."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Текст',
+            group=self.group
+        )
+        self.assertIn(
+            sorted(['posts', f'post:{post.pk}', f'author:{self.user.pk}',
+                    f'group:{self.group.pk}']),
+            self.server.purged
+        )
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        self.assertIn([f'post:{post.pk}'], self.server.purged)
+
+    def test_proxy_down_does_not_fail_writes(self):
+        """Check if posts are saved when the proxy does not answer."""
+        with override_settings(EDGE_PURGE_URL='http://127.0.0.1:9/'):
+            with self.assertLogs('core.purge', 'ERROR'):
+                Post.objects.create(author=self.user, text='Текст')
+        self.assertTrue(Post.objects.exists())
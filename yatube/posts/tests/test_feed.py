@@ -0,0 +1,192 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.core.cache import cache
+
+from ..cache import get_versions
+from ..feed import feed_posts
+from ..models import Post, Follow, FeedEntry
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.stranger = User.objects.create_user(username='Stranger')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+        cls.follow = reverse('posts:follow_index')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def test_follow_backfills_feed(self):
+        """Check if following an author copies the posts into the feed."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.reader,
+                post=self.old_post
+            ).exists()
+        )
+
+    def test_new_post_is_pushed_to_followers_only(self):
+        """Check if a new post gets only into followers' feeds."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.stranger).exists()
+        )
+
+    def test_unfollow_prunes_feed(self):
+        """Check if unfollowing removes author's posts from the feed."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_follow_index_reads_materialized_feed(self):
+        """Check if follow_index shows newest followed posts first."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.reader_client.get(self.follow)
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [post, self.old_post]
+        )
+
+    def test_second_follower_is_able_to_follow(self):
+        """Check if an author with followers can get another one."""
+        Follow.objects.create(user=self.stranger, author=self.author)
+        self.reader_client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.author.username}
+            )
+        )
+        self.assertTrue(
+            Follow.objects.filter(
+                user=self.reader,
+                author=self.author
+            ).exists()
+        )
+
+    @override_settings(FEED_PULL_FOLLOWERS_THRESHOLD=1)
+    def test_popular_author_posts_are_pulled(self):
+        """Check if posts of an author over the threshold are not pushed,
+        but still shown in the feed.
+        """
+        Follow.objects.create(user=self.stranger, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.reader_client.get(self.follow)
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [post, self.old_post]
+        )
+
+    @override_settings(FEED_PULL_FOLLOWERS_THRESHOLD=1)
+    def test_pushed_posts_are_pruned_on_pull(self):
+        """Check if posts pushed before an author turned to pull mode are
+        removed from the feeds, and the merged feed pages by cursors.
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader).exists())
+        Follow.objects.create(user=self.stranger, author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(author=self.author).exists())
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.reader, author=other)
+        posts = [self.old_post]
+        for i in range(12):
+            author = other if i % 2 else self.author
+            posts.append(Post.objects.create(author=author, text=f'{i}'))
+        posts.reverse()
+        response = self.reader_client.get(self.follow)
+        page = response.context['page_obj']
+        self.assertEqual(list(page), posts[:10])
+        response = self.reader_client.get(
+            self.follow, {'cursor': page.paginator.next_token}
+        )
+        self.assertEqual(list(response.context['page_obj']), posts[10:])
+
+    def test_benchmark_takes_more_readers_than_users(self):
+        """Check if the benchmark reads every feed when asked for more,
+        and leaves the shared cache alone.
+        """
+        out = StringIO()
+        generation = get_versions(['posts'])[0]
+        call_command(
+            'benchmark_feed', users=5, posts=2, readers=50,
+            thresholds=[2], stdout=out
+        )
+        self.assertIn('threshold', out.getvalue())
+        self.assertEqual(get_versions(['posts'])[0], generation)
+
+    @override_settings(FEED_PULL_FOLLOWERS_THRESHOLD=2)
+    def test_author_returns_to_push_mode(self):
+        """Check if an author who lost followers is pushed again."""
+        another = User.objects.create_user(username='Another')
+        Follow.objects.create(user=self.stranger, author=self.author)
+        Follow.objects.create(user=another, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(Follow.objects.get(user=self.reader).pull)
+        Follow.objects.filter(user__in=(self.stranger, another)).delete()
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.reader,
+                post=self.old_post
+            ).exists()
+        )
+
+    @override_settings(FEED_PULL_FOLLOWERS_THRESHOLD=4)
+    def test_pull_author_below_threshold_stays_pulled(self):
+        """Check if a new follower of a pull author who has lost some
+        followers, but not half of the threshold, is pulled too and sees
+        new posts.
+        """
+        followers = [
+            User.objects.create_user(username=f'Follower{i}')
+            for i in range(5)
+        ]
+        for follower in followers:
+            Follow.objects.create(user=follower, author=self.author)
+        Follow.objects.filter(user__in=followers[:2]).delete()
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(follow.pull)
+        self.assertTrue(Follow.objects.get(pk=follow.pk).pull)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        for user in (self.reader, followers[-1]):
+            with self.subTest(user=user):
+                self.assertEqual(
+                    list(feed_posts(user)), [post, self.old_post]
+                )
+
+    def test_backfill_copies_newest_posts(self):
+        """Check if only the newest posts of an author are copied into
+        the feed of a new follower.
+        """
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        with mock.patch('posts.feed.FEED_BACKFILL_POSTS', 1):
+            Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            list(FeedEntry.objects.filter(
+                user=self.reader
+            ).values_list('post', flat=True)),
+            [post.pk]
+        )
@@ -1,12 +1,17 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 
+from ..images import MAX_IMAGE_SIDE
 from ..models import Post, Group
 
 
@@ -81,11 +86,12 @@ class PostFormTests(TestCase):
             kwargs={'username': self.user}
         ))
         self.assertEqual(Post.objects.count(), post_count + 1)
+        digest = hashlib.sha256(self.small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text=form_data['text'],
                 group=self.group.pk,
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest}.gif'
             ).exists()
         )
 
@@ -116,3 +122,38 @@ class PostFormTests(TestCase):
         self.assertEqual(response.context['page_obj'][0], Post.objects.get(
             text=form_data['text']
         ))
+
+    def upload_png(self, size):
+        content = BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(content, 'PNG')
+        return SimpleUploadedFile(
+            'big.png', content.getvalue(), content_type='image/png'
+        )
+
+    def test_big_images_are_scaled_down(self):
+        """Check if an image over the limits is stored scaled down
+        and encoded as JPEG.
+        """
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Большая картинка', 'image': self.upload_png(
+                (MAX_IMAGE_SIDE * 2, 100)
+            )}
+        )
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get(text='Большая картинка')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (MAX_IMAGE_SIDE, 50))
+
+    def test_decompression_bombs_are_rejected(self):
+        """Check if an image with too many pixels is not accepted."""
+        with mock.patch('posts.images.MAX_IMAGE_PIXELS', 100):
+            response = self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Бомба', 'image': self.upload_png((20, 20))}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].has_error('image'))
+        self.assertFalse(Post.objects.filter(text='Бомба').exists())
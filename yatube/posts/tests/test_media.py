@@ -0,0 +1,260 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.storage import CLAIM_TIMEOUT, iter_files
+from ..models import Post
+from ..thumbnails import THUMBNAILS
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def age(name, seconds=CLAIM_TIMEOUT + 1):
+    """Makes the stored file look stored that many seconds ago."""
+    modified = time.time() - seconds
+    os.utime(os.path.join(TEMP_MEDIA_ROOT, name), (modified, modified))
+
+
+def stored_files():
+    return sorted(
+        os.path.relpath(entry.path, TEMP_MEDIA_ROOT)
+        for entry in iter_files(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch('posts.signals.pregenerate_thumbnails')
+class ContentAddressedMediaTests(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.user = User.objects.create_user(username='Testuser')
+
+    def create_post(self, name, content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.user,
+            text='Текст',
+            image=SimpleUploadedFile(name, content, content_type='image/gif')
+        )
+
+    def test_identical_uploads_share_a_file(self, pregenerate):
+        """Check if identical uploads are stored once, named by content,
+        and the file is deleted with the last post using it.
+        """
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        name = f'posts/{digest[:2]}/{digest}.gif'
+        self.assertEqual(first.image.name, name)
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(stored_files(), [name])
+        age(name)
+        first.delete()
+        self.assertEqual(stored_files(), [name])
+        second.delete()
+        self.assertEqual(stored_files(), [])
+
+    def test_reused_file_is_not_deleted(self, pregenerate):
+        """Check if a file an upload has just reused is kept when the last
+        committed post using it is deleted.
+        """
+        first = self.create_post('first.gif')
+        name = first.image.name
+        age(name)
+        # An upload of a post which is not committed yet
+        self.assertEqual(
+            default_storage.save('posts/second.gif', ContentFile(SMALL_GIF)),
+            name
+        )
+        first.delete()
+        self.assertEqual(stored_files(), [name])
+
+    def test_replaced_image_is_deleted(self, pregenerate):
+        """Check if an image replaced on edit is deleted, unless another
+        post uses it.
+        """
+        post = self.create_post('first.gif')
+        old_name = post.image.name
+        age(old_name)
+        post = Post.objects.get(pk=post.pk)
+        post.image = SimpleUploadedFile(
+            'second.gif', SMALL_GIF + b'\x00', content_type='image/gif'
+        )
+        post.save()
+        self.assertEqual(stored_files(), [post.image.name])
+        self.assertNotEqual(post.image.name, old_name)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DedupeMediaTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        for name, content in (
+            ('first.gif', SMALL_GIF),
+            ('copy.gif', SMALL_GIF),
+            ('other.gif', SMALL_GIF + b'\x00'),
+        ):
+            path = os.path.join(TEMP_MEDIA_ROOT, 'posts', name)
+            with open(path, 'wb') as file:
+                file.write(content)
+            Post.objects.create(
+                author=self.user, text=name, image=f'posts/{name}'
+            )
+
+    def test_dry_run_changes_nothing(self):
+        """Check if a dry run reports duplicates and keeps the files."""
+        out = StringIO()
+        call_command('dedupe_media', dry_run=True, stdout=out)
+        self.assertIn(
+            f'Would move 3 files, 1 duplicates, {len(SMALL_GIF)} bytes',
+            out.getvalue()
+        )
+        self.assertEqual(len(stored_files()), 3)
+        self.assertTrue(Post.objects.filter(image='posts/copy.gif').exists())
+
+    def test_duplicates_are_merged(self):
+        """Check if identical files are merged, posts point to them and
+        share their thumbnails.
+        """
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn('Moved 3 files, 1 duplicates', out.getvalue())
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        name = f'posts/{digest[:2]}/{digest}.gif'
+        self.assertEqual(Post.objects.filter(image=name).count(), 2)
+        self.assertEqual(len(stored_files()), 2)
+        self.assertIn(name, stored_files())
+        thumbnails = list(
+            iter_files(os.path.join(TEMP_MEDIA_ROOT, 'cache'))
+        )
+        self.assertEqual(len(thumbnails), 2 * len(THUMBNAILS))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CleanMediaTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        cache.clear()
+        for name, content in (
+            ('posts/used.gif', SMALL_GIF),
+            ('posts/orphan.gif', SMALL_GIF + b'\x00'),
+            ('cache/00/00/orphan.jpg', b'thumbnail'),
+        ):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(content)
+            age(name)
+        self.post = Post.objects.create(
+            author=self.user, text='Текст', image='posts/used.gif'
+        )
+        self.orphans = ['cache/00/00/orphan.jpg', 'posts/orphan.gif']
+
+    def all_files(self):
+        return sorted(
+            os.path.relpath(entry.path, TEMP_MEDIA_ROOT)
+            for entry in iter_files(TEMP_MEDIA_ROOT)
+        )
+
+    def test_dry_run_reports_orphans(self):
+        """Check if a dry run lists orphans and keeps every file."""
+        files = self.all_files()
+        out = StringIO()
+        call_command(
+            'clean_media', dry_run=True, min_age=0, verbosity=2, stdout=out
+        )
+        for name in self.orphans:
+            self.assertIn(name, out.getvalue())
+        self.assertIn('Found 2 orphans', out.getvalue())
+        self.assertEqual(self.all_files(), files)
+
+    def test_orphans_are_deleted(self):
+        """Check if only files nothing uses are deleted, in batches."""
+        files = self.all_files()
+        out = StringIO()
+        call_command('clean_media', min_age=0, batch_size=1, stdout=out)
+        self.assertIn('Deleted 2 orphans', out.getvalue())
+        self.assertEqual(
+            self.all_files(),
+            [name for name in files if name not in self.orphans]
+        )
+        self.assertIn('posts/used.gif', self.all_files())
+        self.assertEqual(
+            len(self.all_files()), 1 + len(THUMBNAILS)
+        )
+
+    def test_new_files_are_kept(self):
+        """Check if files younger than min_age are not touched."""
+        out = StringIO()
+        call_command('clean_media', min_age=CLAIM_TIMEOUT * 2, stdout=out)
+        self.assertIn('Deleted 0 orphans of 0 files', out.getvalue())
+
+    def test_reused_orphan_is_kept(self):
+        """Check if an old orphan an upload has just reused is not deleted,
+        even when it is listed before the upload.
+        """
+        content = SMALL_GIF + b'\x01'
+        digest = hashlib.sha256(content).hexdigest()
+        name = f'posts/{digest[:2]}/{digest}.gif'
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as file:
+            file.write(content)
+        age(name)
+        self.assertEqual(
+            default_storage.save('posts/new.gif', ContentFile(content)), name
+        )
+        for min_age in (CLAIM_TIMEOUT, 0):
+            with self.subTest(min_age=min_age):
+                call_command('clean_media', min_age=min_age, stdout=StringIO())
+                self.assertIn(name, self.all_files())
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 4
+URL = '/media/posts/ab/file.jpg'
+EMPTY_URL = '/media/posts/ab/empty.jpg'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_SENDFILE='')
+class MediaServingTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        path = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'ab', 'file.jpg')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(CONTENT)
+        open(os.path.join(os.path.dirname(path), 'empty.jpg'), 'wb').close()
+        cls.path = path
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_file_is_streamed_with_validators(self):
+        """Check if a file is streamed with a strong ETag and far future
+        caching, and a matching If-None-Match gets 304.
+        """
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        response = self.client.get(URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        """Check if single ranges get 206 with their bytes, ranges out of
+        the file get 416 and several ranges get the whole file.
+        """
+        size = len(CONTENT)
+        for header, start, end in (
+            ('bytes=10-19', 10, 19),
+            ('bytes=1000-', 1000, size - 1),
+            ('bytes=-24', size - 24, size - 1),
+            ('bytes=1020-5000', 1020, size - 1),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(URL, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    CONTENT[start:end + 1]
+                )
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/{size}'
+                )
+                self.assertEqual(
+                    response['Content-Length'], str(end - start + 1)
+                )
+        response = self.client.get(URL, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+        response = self.client.get(URL, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+
+    def test_byte_ranges_of_an_empty_file(self):
+        """Check if any range of an empty file gets 416, while the file
+        itself is sent as it is.
+        """
+        for header in ('bytes=0-', 'bytes=0-9', 'bytes=-5'):
+            with self.subTest(header=header):
+                response = self.client.get(EMPTY_URL, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */0')
+        response = self.client.get(EMPTY_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '0')
+
+    def test_if_range(self):
+        """Check if a range is sent only while If-Range still matches."""
+        etag = self.client.get(URL)['ETag']
+        response = self.client.get(
+            URL, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag
+        )
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(
+            URL, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+    def test_web_server_sends_file(self):
+        """Check if the file is handed to the web server when it is set
+        up for it.
+        """
+        with self.settings(MEDIA_SENDFILE='x-accel'):
+            response = self.client.get(URL)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/ab/file.jpg'
+        )
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+        with self.settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.client.get(URL)
+        self.assertEqual(response['X-Sendfile'], self.path)
+
+    def test_files_out_of_media_are_not_found(self):
+        """Check if missing files, directories and paths out of
+        MEDIA_ROOT get 404.
+        """
+        for url in (
+            '/media/posts/missing.jpg',
+            '/media/posts/ab/',
+            '/media/../manage.py',
+            '/media/%2E%2E/manage.py',
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
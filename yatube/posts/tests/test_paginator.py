@@ -0,0 +1,126 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.core.cache import cache
+
+from ..models import Post, Follow
+from ..utils import CursorPaginator
+
+User = get_user_model()
+POSTS_CREATED = 25
+
+
+class CursorPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+        for i in range(POSTS_CREATED):
+            Post.objects.create(author=cls.user, text=f'Пост {i}')
+        Follow.objects.create(user=cls.user, author=cls.user)
+        # Newest first, posts created in the same moment go by id
+        cls.posts = list(Post.objects.order_by('-pub_date', '-pk'))
+        cls.index = reverse('posts:index')
+        cls.follow = reverse('posts:follow_index')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def walk(self, url):
+        """Goes through all pages by next cursors and back."""
+        response = self.client.get(url)
+        pages = [response.context['page_obj']]
+        while pages[-1].paginator.next_token:
+            response = self.client.get(
+                url, {'cursor': pages[-1].paginator.next_token}
+            )
+            pages.append(response.context['page_obj'])
+        backwards = [pages[-1]]
+        while backwards[-1].paginator.previous_token:
+            response = self.client.get(
+                url, {'cursor': backwards[-1].paginator.previous_token}
+            )
+            backwards.append(response.context['page_obj'])
+        return pages, backwards
+
+    def test_cursor_pages_cover_listing_in_order(self):
+        """Check if cursor pages go through every post once, both ways."""
+        for url in (self.index, self.follow):
+            with self.subTest(url=url):
+                pages, backwards = self.walk(url)
+                self.assertEqual(
+                    [post for page in pages for post in page],
+                    self.posts
+                )
+                self.assertEqual(
+                    [page.number for page in pages],
+                    [1, 2, 3]
+                )
+                self.assertEqual(
+                    [list(page) for page in backwards],
+                    [list(page) for page in reversed(pages)]
+                )
+
+    def test_old_page_links_are_served(self):
+        """Check if ?page=N still returns the N-th page."""
+        response = self.client.get(self.index, {'page': 2})
+        page = response.context['page_obj']
+        self.assertEqual(page.number, 2)
+        self.assertEqual(list(page), self.posts[10:20])
+        self.assertIsNotNone(page.paginator.next_token)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Check if a malformed cursor falls back to the first page."""
+        response = self.client.get(self.index, {'cursor': 'broken'})
+        self.assertEqual(list(response.context['page_obj']), self.posts[:10])
+
+    def test_tampered_cursor_returns_first_page(self):
+        """Check if a well-formed cursor with values of wrong types falls
+        back to the first page.
+        """
+        newest = self.posts[0].pub_date.isoformat()
+        for url in (self.index, self.follow):
+            for values in (['x', 'y'], [None, 2], [newest, 'y']):
+                with self.subTest(url=url, values=values):
+                    token = base64.urlsafe_b64encode(
+                        json.dumps([values, 2, True]).encode()
+                    ).decode()
+                    response = self.client.get(url, {'cursor': token})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(
+                        list(response.context['page_obj']), self.posts[:10]
+                    )
+
+    def test_feed_is_not_counted(self):
+        """Check if follow_index pages are served without COUNT(*)."""
+        response = self.client.get(self.follow)
+        paginator = response.context['page_obj'].paginator
+        self.assertIsNone(paginator.total)
+        self.assertEqual(paginator.page_links, [])
+
+    def test_page_links_are_elided(self):
+        """Check if a long listing shows only pages near the current and
+        the edge ones.
+        """
+        paginator = CursorPaginator(Post.objects.all(), 1, total=100)
+        paginator.get_page(10)
+        self.assertEqual(
+            paginator.page_links,
+            [1, None, 8, 9, 10, 11, 12, None, 100]
+        )
+        paginator = CursorPaginator(Post.objects.all(), 10, total=30)
+        paginator.get_page(1)
+        self.assertEqual(paginator.page_links, [1, 2, 3])
+
+    def test_out_of_range_page_falls_back(self):
+        """Check if a page after the end is served from the real rows."""
+        paginator = CursorPaginator(Post.objects.all(), 10, total=100)
+        page = paginator.get_page(50)
+        self.assertEqual(page.number, 1)
+        self.assertEqual(list(page), self.posts[:10])
@@ -0,0 +1,146 @@
+from http import HTTPStatus
+from io import StringIO
+from itertools import cycle
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, Group, Comment, Follow, FeedEntry
+from ..rendering import EXCERPT_CHARS, rerender_posts
+
+User = get_user_model()
+# Queries of a logged in user's page, session and user lookups included,
+# the feed also reads followed authors for its cache key and the post page
+# reads the author of the post
+MAX_QUERIES = {
+    'index': 6,
+    'group_list': 6,
+    'profile': 7,
+    'post_detail': 7,
+    'follow_index': 7,
+}
+
+
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(slug='testgroup', title='Группа')
+        for i in range(15):
+            post = Post.objects.create(
+                author=cls.user,
+                text=f'Пост {i}',
+                group=cls.group
+            )
+        Comment.objects.create(post=post, author=cls.reader, text='Текст')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def test_pages_read_by_indexes(self):
+        """Check if no query of post pages scans a table or sorts rows."""
+        call_command('explain_queries', fail_on_scan=True, stdout=StringIO())
+
+
+class QueryCountTests(TestCase):
+    """Pages must run the same number of queries whatever the number
+    of posts and comments they show.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(slug='testgroup', title='Группа')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост',
+            group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.pages = (
+            ('index', reverse('posts:index')),
+            ('group_list', reverse('posts:group_list', args=[cls.group.slug])),
+            ('profile', reverse('posts:profile', args=[cls.user.username])),
+            ('post_detail', reverse('posts:post_detail', args=[cls.post.pk])),
+            ('follow_index', reverse('posts:follow_index')),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def grow_to(self, size):
+        """Adds rendered posts to the feed and comments to the post
+        up to size.
+        """
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Пост', group=self.group)
+            for _ in range(size - Post.objects.count())
+        )
+        FeedEntry.objects.bulk_create(
+            FeedEntry(
+                user=self.reader,
+                post=post,
+                author=self.user,
+                pub_date=post.pub_date
+            )
+            for post in Post.objects.exclude(feed_entries__user=self.reader)
+        )
+        rerender_posts(Post.objects.filter(card_html=''))
+        authors = cycle((self.user, self.reader))
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=next(authors), text='Комментарий')
+            for _ in range(size - self.post.comments.count())
+        )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Check if pages run a bounded and constant number of queries
+        for 1, 10 and 1000 rows.
+        """
+        counts = {name: [] for name, _ in self.pages}
+        for size in (1, 10, 1000):
+            self.grow_to(size)
+            for name, url in self.pages:
+                counts[name].append(self.count_queries(url))
+        for name, _ in self.pages:
+            with self.subTest(page=name):
+                self.assertLessEqual(max(counts[name]), MAX_QUERIES[name])
+                self.assertEqual(len(set(counts[name])), 1, counts[name])
+
+    def test_listings_load_card_columns_only(self):
+        """Check if listings load neither user passwords nor full texts,
+        and cut long texts to an excerpt.
+        """
+        self.post.text = 'Т' * 1000
+        self.post.save()
+        for name, url in self.pages:
+            if name == 'post_detail':
+                continue
+            with self.subTest(page=name):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                posts = [query['sql'] for query in queries
+                         if 'FROM "posts_post"' in query['sql']]
+                self.assertTrue(posts)
+                for sql in posts:
+                    self.assertNotIn('"password"', sql)
+                    self.assertNotIn(', "posts_post"."text"', sql)
+                self.assertContains(
+                    response, 'Т' * (EXCERPT_CHARS - 1) + '…'
+                )
+                self.assertNotContains(response, 'Т' * EXCERPT_CHARS)
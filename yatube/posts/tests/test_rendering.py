@@ -0,0 +1,123 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from unittest import mock
+
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from ..cache import bump
+from ..models import Post, Group
+
+User = get_user_model()
+
+
+class RenderingTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+        cls.group = Group.objects.create(slug='first', title='Первая')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Старый текст',
+            group=cls.group
+        )
+        cls.index = reverse('posts:index')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_post_is_rendered_on_save(self):
+        """Check if the card and the body are stored on save."""
+        self.post.refresh_from_db()
+        self.assertIn('Старый текст', self.post.card_html)
+        self.assertIn(
+            reverse('posts:group_list', args=[self.group.slug]),
+            self.post.card_html
+        )
+        self.assertIn('Старый текст', self.post.body_html)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertIn('Новый текст', self.post.card_html)
+        self.assertIn('Новый текст', self.post.body_html)
+
+    def test_pages_emit_stored_html(self):
+        """Check if listings and the post page show the stored HTML."""
+        Post.objects.filter(pk=self.post.pk).update(
+            card_html='<p>Готовая карточка</p>',
+            body_html='<p>Готовый текст</p>'
+        )
+        bump('posts', f'post:{self.post.pk}')
+        self.assertContains(self.client.get(self.index), 'Готовая карточка')
+        self.assertContains(
+            self.client.get(
+                reverse('posts:post_detail', args=[self.post.pk])
+            ),
+            'Готовый текст'
+        )
+
+    def test_missing_cards_are_rendered_on_read(self):
+        """Check if a post without HTML is rendered and stored once."""
+        Post.objects.filter(pk=self.post.pk).update(card_html='')
+        bump('posts')
+        self.assertContains(self.client.get(self.index), 'Старый текст')
+        self.assertNotEqual(
+            Post.objects.get(pk=self.post.pk).card_html, ''
+        )
+
+    def test_cards_follow_author_and_group_changes(self):
+        """Check if cards are rendered again for new names and slugs."""
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Пётр'
+        user.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertIn('Пётр', post.card_html)
+        self.assertIn('/group/renamed/', post.card_html)
+        group.delete()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertNotIn('/group/renamed/', post.card_html)
+
+    def test_other_changes_render_nothing(self):
+        """Check if saves which change no names render no cards and keep
+        cached pages of other users.
+        """
+        user = User.objects.get(pk=self.user.pk)
+        group = Group.objects.get(pk=self.group.pk)
+        with mock.patch('posts.signals.run_in_background') as run:
+            user.set_password('new-password')
+            user.email = 'new@example.com'
+            user.save()
+            group.description = 'Новое описание'
+            group.save()
+        run.assert_not_called()
+
+    @override_settings(BACKGROUND_JOBS_EAGER=False)
+    def test_cards_are_rendered_after_commit(self):
+        """Check if a rename leaves rendering to a job run on commit."""
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Пётр'
+        with mock.patch('core.background.transaction.on_commit') as commit:
+            user.save()
+        self.assertNotIn(
+            'Пётр', Post.objects.get(pk=self.post.pk).card_html
+        )
+        commit.assert_called_once()
+
+    def test_rerender_command_renders_all_posts(self):
+        """Check if rerender_posts renders posts again in batches."""
+        Post.objects.create(author=self.user, text='Второй пост')
+        Post.objects.update(card_html='', body_html='')
+        out = StringIO()
+        call_command('rerender_posts', batch_size=1, stdout=out)
+        self.assertIn('Rendered 2 posts', out.getvalue())
+        self.assertFalse(Post.objects.filter(card_html='').exists())
+        self.assertFalse(Post.objects.filter(body_html='').exists())
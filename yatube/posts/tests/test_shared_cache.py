@@ -0,0 +1,126 @@
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from core.cache import FileCache, Packed, cache_metrics, reset_cache_metrics
+
+TEMP_CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class SharedCacheTests(SimpleTestCase):
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.cache = FileCache(TEMP_CACHE_DIR, {
+            'KEY_PREFIX': 'first',
+            'COMPRESS_MIN_BYTES': 100,
+        })
+        self.cache.clear()
+        reset_cache_metrics()
+
+    def test_big_values_are_compressed(self):
+        """Check if big values are stored compressed and read back."""
+        value = {'text': 'Пост' * 1000}
+        self.cache.set('big', value)
+        self.cache.set('small', 'Пост')
+        stored = FileBasedCache.get(self.cache, 'big')
+        self.assertIsInstance(stored, Packed)
+        self.assertTrue(stored.compressed)
+        self.assertLess(len(stored.data), 1000)
+        self.assertFalse(FileBasedCache.get(self.cache, 'small').compressed)
+        self.assertEqual(self.cache.get('big'), value)
+        self.assertEqual(self.cache.get_many(['small']), {'small': 'Пост'})
+
+    def test_counters_are_incremented(self):
+        """Check if integers are stored as they are and incremented."""
+        self.assertTrue(self.cache.add('generation', 1))
+        self.assertFalse(self.cache.add('generation', 5))
+        self.assertEqual(self.cache.incr('generation'), 2)
+        self.assertEqual(self.cache.get('generation'), 2)
+
+    def test_add_is_atomic(self):
+        """Check if only one of concurrent adds of a key succeeds, and an
+        increment keeps the expiry of the counter.
+        """
+        caches = [
+            FileCache(TEMP_CACHE_DIR, {'KEY_PREFIX': 'first'})
+            for _ in range(8)
+        ]
+        with ThreadPoolExecutor(len(caches)) as pool:
+            added = list(pool.map(
+                lambda pair: pair[1].add('lock', pair[0], 10),
+                enumerate(caches * 4)
+            ))
+        self.assertEqual(added.count(True), 1)
+        self.cache.add('generation', 1, 1)
+        self.cache.incr('generation')
+        time.sleep(1.1)
+        with self.assertRaises(ValueError):
+            self.cache.incr('generation')
+        self.cache.add('generation', 1, None)
+        self.assertEqual(self.cache.incr('generation', 5), 6)
+        self.assertEqual(self.cache.get('generation'), 6)
+
+    def test_keys_are_namespaced(self):
+        """Check if caches with other prefixes do not share keys."""
+        other = FileCache(TEMP_CACHE_DIR, {'KEY_PREFIX': 'second'})
+        self.cache.set('key', 'first')
+        other.set('key', 'second')
+        self.assertEqual(self.cache.get('key'), 'first')
+        self.assertEqual(other.get('key'), 'second')
+
+    def test_metrics_are_counted(self):
+        """Check if hits, misses and bytes are counted per cache."""
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+        self.cache.get_many(['key', 'missing'])
+        metrics = cache_metrics()[self.cache.metrics_name]
+        self.assertEqual(metrics['hits'], 2)
+        self.assertEqual(metrics['misses'], 1)
+        self.assertEqual(metrics['sets'], 1)
+        self.assertGreater(metrics['bytes_written'], 0)
+        self.assertEqual(metrics['bytes_read'], 2 * metrics['bytes_written'])
+
+    def test_metrics_of_workers_are_added_up(self):
+        """Check if processes add their metrics to the cache once in an
+        interval, and the command prints them.
+        """
+        cache = FileCache(TEMP_CACHE_DIR, {
+            'KEY_PREFIX': 'first',
+            'METRICS_FLUSH_INTERVAL': 0,
+        })
+        cache.get('missing')
+        cache.set('key', 'value')
+        cache.get('key')
+        cache.get('key')
+        self.assertEqual(cache.read_metrics(), {
+            'hits': 2,
+            'misses': 1,
+            'sets': 1,
+            'bytes_read': 2 * cache_metrics()[cache.metrics_name][
+                'bytes_written'
+            ],
+            'bytes_written': cache_metrics()[cache.metrics_name][
+                'bytes_written'
+            ],
+        })
+        out = StringIO()
+        with mock.patch(
+            'posts.management.commands.cache_metrics.caches',
+            {'default': cache}
+        ):
+            call_command('cache_metrics', stdout=out)
+        row = out.getvalue().splitlines()[1].split()
+        self.assertEqual(row[:5], ['default', '2', '1', '66.7', '1'])
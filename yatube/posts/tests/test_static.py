@@ -0,0 +1,93 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+import brotli
+from django.conf import settings
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CSS = 'css/bootstrap.min.css'
+
+
+@override_settings(STATIC_ROOT=TEMP_STATIC_ROOT)
+class StaticFilesTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(settings.BASE_DIR, 'static', CSS), 'rb') as f:
+            cls.css = f.read()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+
+    def test_pages_link_hashed_files(self):
+        """Check if the base template links every asset by its hashed
+        name under STATIC_URL.
+        """
+        response = self.client.get('/')
+        for name in (
+            CSS,
+            'img/fav/favicon.ico',
+            'img/fav/apple-touch-icon.png',
+            'img/fav/favicon-32x32.png',
+            'img/fav/favicon-16x16.png',
+        ):
+            with self.subTest(name=name):
+                url = static(name)
+                self.assertNotEqual(url, settings.STATIC_URL + name)
+                self.assertContains(response, f'href="{url}"')
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertNotContains(response, 'href="static/')
+
+    def test_hashed_files_are_precompressed_and_immutable(self):
+        """Check if a hashed file is sent gzipped to clients taking it,
+        plain to others, and cached for good.
+        """
+        url = static(CSS)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('immutable', response['Cache-Control'])
+        content = b''.join(response.streaming_content)
+        self.assertLess(len(content), len(self.css))
+        self.assertEqual(gzip.decompress(content), self.css)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), self.css)
+
+    def test_brotli_is_preferred(self):
+        """Check if a brotli variant is written next to the hashed file
+        and sent to clients taking it.
+        """
+        url = static(CSS)
+        path = os.path.join(
+            TEMP_STATIC_ROOT, url[len(settings.STATIC_URL):] + '.br'
+        )
+        self.assertTrue(os.path.isfile(path))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        content = b''.join(response.streaming_content)
+        self.assertLess(len(content), len(self.css))
+        self.assertEqual(brotli.decompress(content), self.css)
+
+    def test_plain_names_are_revalidated(self):
+        """Check if files under their plain names are not cached for good
+        and answer 304 to their ETag.
+        """
+        response = self.client.get(settings.STATIC_URL + CSS)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response = self.client.get(
+            settings.STATIC_URL + CSS, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,198 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.background import run_in_background, wait_for_jobs
+from ..models import Post
+from ..rendering import render_posts
+from ..thumbnails import THUMBNAILS, generate_post_thumbnails
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testuser')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(
+            os.path.join(TEMP_MEDIA_ROOT, 'cache'), ignore_errors=True
+        )
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        with mock.patch('posts.signals.pregenerate_thumbnails') as schedule:
+            post = Post.objects.create(
+                author=self.user,
+                text='Текст',
+                image=SimpleUploadedFile(
+                    name, content, content_type='image/gif'
+                )
+            )
+        schedule.assert_called_once_with(post)
+        return Post.objects.get(pk=post.pk)
+
+    def thumbnail_files(self):
+        return [
+            name
+            for _, _, names in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'cache'))
+            for name in names
+        ]
+
+    def test_upload_is_not_resized_on_save(self):
+        """Check if a new image is linked as it is over its placeholder
+        made on save until its thumbnails are made in the background,
+        and then the post shows them.
+        """
+        post = self.create_post()
+        self.assertIn(post.image.url, post.card_html)
+        self.assertIn(post.image.url, post.body_html)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/png;base64,')
+        )
+        self.assertIn(post.image_placeholder, post.card_html)
+        self.assertIn(post.image_placeholder, post.body_html)
+        self.assertEqual(self.thumbnail_files(), [])
+        generate_post_thumbnails(post.pk)
+        post.refresh_from_db()
+        self.assertEqual(len(self.thumbnail_files()), len(THUMBNAILS))
+        self.assertIn(post.image_placeholder, post.card_html)
+        self.assertNotIn(post.image.url, post.card_html)
+        self.assertIn(settings.MEDIA_URL + 'cache/', post.card_html)
+
+    def test_job_leaves_posts_sharing_the_file(self):
+        """Check if the job of a post does not change other posts which
+        share its file.
+        """
+        first = self.create_post()
+        second = self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        generate_post_thumbnails(first.pk)
+        shared = Post.objects.get(pk=second.pk)
+        self.assertEqual(shared.image_placeholder, second.image_placeholder)
+        self.assertEqual(shared.card_html, second.card_html)
+
+    def test_command_makes_missing_thumbnails(self):
+        """Check if the command makes thumbnails and placeholders of
+        stored images.
+        """
+        post = self.create_post()
+        out = StringIO()
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None, image_height=None, image_placeholder=''
+        )
+        call_command('pregenerate_thumbnails', workers=1, stdout=out)
+        self.assertIn('Made thumbnails of 1 images, 0 failed', out.getvalue())
+        self.assertEqual(len(self.thumbnail_files()), len(THUMBNAILS))
+        post.refresh_from_db()
+        self.assertIn(settings.MEDIA_URL + 'cache/', post.card_html)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(post.image_placeholder)
+        self.assertIn(post.image_placeholder, post.card_html)
+
+    def test_command_recovers_lost_jobs(self):
+        """Check if the command with --missing makes only images which
+        have no thumbnails.
+        """
+        done = self.create_post('done.gif')
+        generate_post_thumbnails(done.pk)
+        lost = self.create_post('lost.gif', SMALL_GIF + b'\x00')
+        out = StringIO()
+        call_command(
+            'pregenerate_thumbnails', workers=1, missing=True, stdout=out
+        )
+        self.assertIn(
+            'Made thumbnails of 1 images, 0 failed, rendered 1 posts',
+            out.getvalue()
+        )
+        self.assertEqual(len(self.thumbnail_files()), 2 * len(THUMBNAILS))
+        lost.refresh_from_db()
+        self.assertIn(settings.MEDIA_URL + 'cache/', lost.card_html)
+
+    @override_settings(BACKGROUND_JOBS_EAGER=False)
+    def test_jobs_run_in_worker_threads(self):
+        """Check if a job is queued on commit and run by a worker thread,
+        not by the request.
+        """
+        threads = []
+        with mock.patch('core.background.transaction.on_commit') as commit:
+            run_in_background(
+                lambda: threads.append(threading.current_thread())
+            )
+        self.assertEqual(threads, [])
+        commit.call_args[0][0]()
+        wait_for_jobs()
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.current_thread())
+        self.assertTrue(threads[0].daemon)
+
+    def test_thumbnails_of_a_batch_are_read_at_once(self):
+        """Check if rendering posts looks their thumbnails up by two
+        queries, whatever the number of posts.
+        """
+        posts = [self.create_post(f'small{i}.gif') for i in range(5)]
+        for post in posts:
+            generate_post_thumbnails(post.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            render_posts(
+                Post.objects.select_related('author', 'group').filter(
+                    pk__in=[post.pk for post in posts]
+                )
+            )
+        lookups = [query['sql'] for query in queries
+                   if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(lookups), 2, lookups)
+        for post in Post.objects.filter(pk__in=[post.pk for post in posts]):
+            self.assertIn(settings.MEDIA_URL + 'cache/', post.card_html)
+
+    def test_cards_offer_width_variants(self):
+        """Check if the image of a card has every width variant, is sized
+        up front, has a placeholder and is loaded lazily.
+        """
+        post = self.create_post()
+        self.assertIn('width="2" height="1"', post.card_html)
+        self.assertIn('loading="lazy"', post.card_html)
+        generate_post_thumbnails(post.pk)
+        post.refresh_from_db()
+        for html in (post.card_html, post.body_html):
+            self.assertIn('srcset="', html)
+            for width in (320, 640, 960):
+                self.assertIn(f' {width}w', html)
+            self.assertIn('sizes="', html)
+            self.assertIn('width="960" height="339"', html)
+            self.assertIn('loading="lazy"', html)
+            self.assertIn(
+                f'url({post.image_placeholder}) center / cover', html
+            )
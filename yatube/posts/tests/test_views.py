@@ -296,30 +296,49 @@ class PostViewTests(TestCase):
         self.assertEqual(response.context['comments'][0], self.comment)
 
     def test_cache_is_working(self):
-        """Check if caching is working."""
+        """Check if pages are cached until their posts change."""
         self.post4 = Post.objects.create(
             author=self.user,
             text='Новый пост8888',
             group=self.group2
         )
-        #  Getting content before and after post deleted
+        #  Getting content before and after the post is changed
+        #  without signals
         response1 = self.authorized_client.get(self.index).content
-        self.post4.delete()
+        Post.objects.filter(pk=self.post4.pk).update(text='Другой текст')
         response2 = self.authorized_client.get(self.index).content
-        #  Asserting nothing has changed despite deleting post
+        #  Asserting nothing has changed as the page is cached
         self.assertEqual(
             response1,
             response2
         )
-        #  Clearing cache
-        cache.clear()
-        #  Getting new response after cache was cleared
+        #  Deleting the post drops the cached page right away
+        self.post4.delete()
         response2 = self.authorized_client.get(self.index).content
         self.assertNotEqual(
             response1,
             response2
         )
 
+    def test_cached_pages_show_new_posts(self):
+        """Check if a new post is shown on cached pages it belongs to."""
+        pages = (
+            self.index,
+            reverse('posts:group_list', kwargs={'slug': self.group2.slug}),
+            self.profile,
+        )
+        for page in pages:
+            self.authorized_client.get(page)
+        Post.objects.create(
+            author=self.user,
+            text='Новый пост7777',
+            group=self.group2
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                self.assertContains(response, 'Новый пост7777')
+
     def test_auth_user_is_able_to_follow_other_users(self):
         """
         Check if auth user is able to follow other users and
@@ -0,0 +1,57 @@
+from sorl.thumbnail import default, get_thumbnail
+
+from core.background import run_in_background
+from .cache import bump, post_scopes
+from .models import Post
+from .rendering import store_rendered
+
+# Width variants of post images, browsers pick one of them by srcset
+THUMBNAILS = (
+    ('320x113', {'crop': 'center', 'upscale': True}),
+    ('640x226', {'crop': 'center', 'upscale': True}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+
+def generate_thumbnails(image):
+    """Makes the width variants of the image, unless they are made
+    already.
+    """
+    for geometry, options in THUMBNAILS:
+        get_thumbnail(image, geometry, **options)
+
+
+def has_thumbnails(image):
+    """Checks if sorl knows of as many thumbnails of the image as there
+    are width variants.
+    """
+    thumbnails = default.kvstore._get(image.key, identity='thumbnails')
+    return len(thumbnails or ()) >= len(THUMBNAILS)
+
+
+def generate_post_thumbnails(post_pk):
+    """Makes the thumbnails of the post, then renders it with them and
+    drops the pages showing it.
+
+    The placeholder is made when the post is saved, and those of older
+    posts by the pregenerate_thumbnails command.
+    """
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_pk
+    ).first()
+    if post is None or not post.image:
+        return
+    generate_thumbnails(post.image)
+    store_rendered(post)
+    bump(*post_scopes(post))
+
+
+def pregenerate_thumbnails(post):
+    """Makes thumbnails of the post in the background once it is
+    committed, so that neither the request saving it nor the first
+    readers resize the image.
+
+    Jobs lost with a stopped process are made by the
+    pregenerate_thumbnails command with --missing.
+    """
+    run_in_background(generate_post_thumbnails, post.pk)
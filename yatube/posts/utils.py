@@ -1,8 +1,298 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import heapq
+import json
+import math
+from datetime import datetime
+from itertools import islice
 
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator, Page
+from django.db.models import Q
 
-def pagination(request, queryset, limit):
-    """Creates paginator on pages."""
-    paginator = Paginator(queryset, limit)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+
+EXACT_COUNT_LIMIT = 1000  # smaller listings are counted on every request
+COUNT_CACHE_TIMEOUT = 60  # seconds a bigger listing's total is trusted
+ELIDED_RANGE_FROM = 10  # listings with more pages show an elided range
+PAGES_ON_EACH_SIDE = 2  # page links around the current one
+PAGES_ON_ENDS = 1  # page links at the start and at the end
+# Columns of a post read by listings, which emit the stored card
+CARD_FIELDS = (
+    'pub_date',
+    'updated_at',
+    'image',
+    'card_html',
+)
+
+
+class MergedQuerySet:
+    """Querysets with the same ordering merged into one listing, each
+    one read by its own index range.
+    """
+
+    def __init__(self, *parts):
+        self.parts = parts
+
+    @property
+    def query(self):
+        return self.parts[0].query
+
+    @property
+    def model(self):
+        return self.parts[0].model
+
+    @property
+    def ordered(self):
+        return all(part.ordered for part in self.parts)
+
+    def _map(self, method, *args, **kwargs):
+        return MergedQuerySet(
+            *(getattr(part, method)(*args, **kwargs) for part in self.parts)
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._map('filter', *args, **kwargs)
+
+    def order_by(self, *field_names):
+        return self._map('order_by', *field_names)
+
+    def reverse(self):
+        return self._map('reverse')
+
+    def only(self, *fields):
+        return self._map('only', *fields)
+
+    def values(self, *fields):
+        return self._map('values', *fields)
+
+    def count(self):
+        return sum(part.count() for part in self.parts)
+
+    def _merge(self, stop=None):
+        query = self.query
+        ordering = list(query.order_by or query.get_meta().ordering)
+        descending = {name.startswith('-') for name in ordering}
+        if len(descending) != 1:
+            raise ValueError('Parts must be ordered in one direction.')
+        names = [name.lstrip('-') for name in ordering]
+        rows = heapq.merge(
+            *(part[:stop] for part in self.parts),
+            key=lambda row: [getattr(row, name) for name in names],
+            reverse=descending.pop() == query.standard_ordering
+        )
+        seen = set()
+        for row in rows:
+            if row.pk not in seen:
+                seen.add(row.pk)
+                yield row
+
+    def __iter__(self):
+        return self._merge()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Only slices of rows are supported.')
+        return list(islice(self._merge(index.stop), index.start, index.stop))
+
+
+class CursorPaginator(Paginator):
+    """Paginates a queryset by keyset cursors instead of OFFSET.
+
+    Page links need the total, passed by the caller or counted and
+    cached under count_key, there are none without both.
+    """
+
+    def __init__(self, object_list, per_page, total=None, count_key=None,
+                 tie_breaker='pk', **kwargs):
+        query = object_list.query
+        ordering = list(query.order_by or query.get_meta().ordering)
+        names = {name.lstrip('-') for name in ordering}
+        if not {tie_breaker, 'pk', 'id'} & names:
+            descending = ordering[0].startswith('-')
+            ordering.append(f'-{tie_breaker}' if descending else tie_breaker)
+        self.keys = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+        super().__init__(object_list.order_by(*ordering), per_page, **kwargs)
+        self.total = total
+        self.count_key = count_key
+        self.next_token = None
+        self.previous_token = None
+        self.page_links = []
+
+    def get_total(self):
+        """Returns the known or cached number of objects, if any."""
+        if self.total is None and self.count_key is not None:
+            self.total = cache.get(self.count_key)
+            if self.total is None or self.total <= EXACT_COUNT_LIMIT:
+                # Annotations left out keep COUNT(*) off a subquery
+                self.total = self.object_list.values('pk').count()
+                cache.set(self.count_key, self.total, COUNT_CACHE_TIMEOUT)
+        return self.total
+
+    def get_page(self, number):
+        """Returns a page by its number through OFFSET, for old links."""
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        objects = self._offset_rows(number)
+        if not objects and number > 1:
+            # Out of range numbers get the last page by the total if it
+            # is fresh enough, or else the first one
+            number = self._last_known_page(number)
+            objects = self._offset_rows(number)
+            if not objects:
+                number = 1
+                objects = self._offset_rows(number)
+        has_next = len(objects) > self.per_page
+        return self._build_page(
+            objects[:self.per_page], number, number > 1, has_next
+        )
+
+    def get_cursor_page(self, token):
+        """Returns a page pointed by the token or the first page."""
+        values, number, forward = None, 1, True
+        if token:
+            try:
+                values, number, forward = self._decode(token)
+            except (TypeError, ValueError, ValidationError, binascii.Error):
+                pass
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        if not forward:
+            queryset = queryset.reverse()
+        objects = list(queryset[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if forward:
+            has_previous, has_next = values is not None, has_more
+        else:
+            objects.reverse()
+            has_previous, has_next = has_more, True
+        if not objects:
+            has_previous, has_next = number > 1, False
+        return self._build_page(objects, number, has_previous, has_next)
+
+    def get_elided_page_range(self, number):
+        """Yields page numbers around the current and the edge pages,
+        with None in place of skipped ones.
+        """
+        on_each_side, on_ends = PAGES_ON_EACH_SIDE, PAGES_ON_ENDS
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield None
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield None
+            yield from range(
+                self.num_pages - on_ends + 1, self.num_pages + 1
+            )
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def _offset_rows(self, number):
+        bottom = (number - 1) * self.per_page
+        return list(self.object_list[bottom:bottom + self.per_page + 1])
+
+    def _last_known_page(self, number):
+        total = self.get_total()
+        if total is None:
+            return 1
+        return min(number - 1, max(math.ceil(total / self.per_page), 1))
+
+    def _build_page(self, objects, number, has_previous, has_next):
+        total = self.get_total()
+        # The total may be stale, so the fetched rows have the last word
+        self.num_pages = number
+        if has_next:
+            self.num_pages = number + 1
+            if total is not None:
+                self.num_pages = max(
+                    self.num_pages, math.ceil(total / self.per_page)
+                )
+        if total is not None and self.num_pages > 1:
+            self.page_links = list(self.page_range)
+            if self.num_pages > ELIDED_RANGE_FROM:
+                self.page_links = list(self.get_elided_page_range(number))
+        page = Page(objects, number, self)
+        self._set_tokens(page, has_previous, has_next)
+        return page
+
+    def _seek(self, values, forward):
+        """Builds a filter of rows which go after or before the cursor."""
+        condition = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for equal_index, (equal_name, _) in enumerate(self.keys[:index]):
+                step &= Q(**{equal_name: values[equal_index]})
+            condition |= step
+        return condition
+
+    def _set_tokens(self, page, has_previous, has_next):
+        if not len(page):
+            return
+        if has_next:
+            self.next_token = self._encode(page[-1], page.number + 1, True)
+        if has_previous:
+            self.previous_token = self._encode(
+                page[0], page.number - 1, False
+            )
+
+    def _encode(self, obj, number, forward):
+        values = [getattr(obj, name) for name, _ in self.keys]
+        # Full isoformat keeps microseconds which tell apart close posts
+        values = [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ]
+        data = json.dumps([values, number, forward])
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def _decode(self, token):
+        padding = '=' * (-len(token) % 4)
+        values, number, forward = json.loads(
+            base64.urlsafe_b64decode(token + padding)
+        )
+        if len(values) != len(self.keys) or int(number) < 1:
+            raise ValueError('Cursor does not match the ordering.')
+        # Tokens come from the query string, so every value is parsed by
+        # its field before it gets into the filter
+        values = [
+            self._key_field(name).to_python(value)
+            for (name, _), value in zip(self.keys, values)
+        ]
+        if None in values:
+            raise ValueError('Cursor has an empty value.')
+        return values, int(number), bool(forward)
+
+    def _key_field(self, name):
+        query = self.object_list.query
+        if name in query.annotations:
+            return query.annotations[name].output_field
+        if name == 'pk':
+            return query.get_meta().pk
+        return query.get_meta().get_field(name)
+
+
+def post_cards(posts):
+    """Loads only the columns listings need, the stored card among them."""
+    return posts.only('author', 'group', *CARD_FIELDS)
+
+
+def pagination(request, queryset, limit, **kwargs):
+    """Creates paginator on pages.
+
+    Pages are addressed by cursor tokens, ?page=N of old links and of
+    the page links is still served through OFFSET.
+    """
+    paginator = CursorPaginator(queryset, limit, **kwargs)
+    if 'page' in request.GET:
+        return paginator.get_page(request.GET.get('page'))
+    return paginator.get_cursor_page(request.GET.get('cursor'))
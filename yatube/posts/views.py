@@ -2,10 +2,12 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect
 from django.contrib.auth import get_user_model
-from django.views.decorators.cache import cache_page
+from .cache import cached_page
+from .counters import get_user_stats
+from .feed import feed_posts
 from .forms import PostForm, CommentForm
 from .models import Post, Group, Follow
-from .utils import pagination
+from .utils import pagination, post_cards
 
 
 MAX_POSTS_VISIBLE = 10  # the number of posts you'll see on page
@@ -13,74 +15,119 @@ MAX_POST_CHARS = 30  # the amount of text displayed
 User = get_user_model()
 
 
-@cache_page(20, cache='default', key_prefix='index_page')
 def index(request):
     """Start page for posts app."""
     template = 'posts/index.html'
-    posts = Post.objects.select_related('author', 'group')
-    title = 'Последние обновления на сайте'
-    context = {
-        'title': title,
-        'posts': posts,
-        'page_obj': pagination(request, posts, MAX_POSTS_VISIBLE),
-    }
-    return render(request, template, context)
+
+    def render_page():
+        posts = post_cards(Post.objects.all())
+        title = 'Последние обновления на сайте'
+        context = {
+            'title': title,
+            'posts': posts,
+            'page_obj': pagination(
+                request,
+                posts,
+                MAX_POSTS_VISIBLE,
+                count_key='posts:count:index'
+            ),
+            'shared_page': True,
+        }
+        return render(request, template, context)
+    return cached_page(request, ['posts'], render_page, shared=True)
 
 
 def group_posts(request, slug):
     """List of posts by certain group."""
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('group')
-    title = f'Записи сообщества {group.title}'
-    context = {
-        'title': title,
-        'group': group,
-        'posts': posts,
-        'page_obj': pagination(request, posts, MAX_POSTS_VISIBLE),
-    }
-    return render(request, template, context)
+
+    def render_page():
+        posts = post_cards(group.posts.all())
+        title = f'Записи сообщества {group.title}'
+        context = {
+            'title': title,
+            'group': group,
+            'posts': posts,
+            'page_obj': pagination(
+                request,
+                posts,
+                MAX_POSTS_VISIBLE,
+                total=group.posts_count
+            ),
+            'shared_page': True,
+        }
+        return render(request, template, context)
+    return cached_page(
+        request, [f'group:{group.pk}'], render_page, shared=True
+    )
 
 
 def profile(request, username):
     """Calls page with user's profile."""
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    title = f'Профиль пользователя {author.get_full_name()}'
-    posts = author.posts.select_related('author', 'group')
-    total_posts = posts.count()
-    following = False
-    if request.user.is_authenticated:
-        following = author.following.filter(user=request.user).exists()
-    context = {
-        'title': title,
-        'author': author,
-        'page_obj': pagination(request, posts, MAX_POSTS_VISIBLE),
-        'total_posts': total_posts,
-        'following': following,
-    }
-    return render(request, template, context)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+
+    def render_page():
+        title = f'Профиль пользователя {author.get_full_name()}'
+        posts = post_cards(author.posts.all())
+        stats = get_user_stats(author)
+        total_posts = stats.posts_count
+        following = False
+        if request.user.is_authenticated:
+            following = author.following.filter(user=request.user).exists()
+        context = {
+            'title': title,
+            'author': author,
+            'page_obj': pagination(
+                request, posts, MAX_POSTS_VISIBLE, total=total_posts
+            ),
+            'total_posts': total_posts,
+            'stats': stats,
+            'following': following,
+        }
+        return render(request, template, context)
+    return cached_page(request, [f'author:{author.pk}'], render_page)
 
 
 def post_detail(request, post_id):
-    """Expands post information."""
+    """Expands post information.
+
+    The page is shared by all users, the edit button and the comment
+    form are stitched into it for each of them.
+    """
     template = 'posts/post_detail.html'
-    post = get_object_or_404(
-        Post.objects.select_related('group', 'author'),
+    author_id = get_object_or_404(
+        Post.objects.values_list('author_id', flat=True),
         id=post_id
     )
-    comments = post.comments.select_related('post')
-    form = CommentForm()
-    title = f'Пост {post.text[:MAX_POST_CHARS]}'
-    total_posts = post.author.posts.count()
-    context = {
-        'title': title,
-        'posts': post,
-        'total_posts': total_posts,
-        'form': form,
-        'comments': comments,
-    }
-    return render(request, template, context)
+
+    def render_page():
+        post = Post.objects.select_related(
+            'group', 'author', 'author__stats'
+        ).get(id=post_id)
+        comments = post.comments.select_related('author')
+        form = CommentForm()
+        title = f'Пост {post.text[:MAX_POST_CHARS]}'
+        total_posts = get_user_stats(post.author).posts_count
+        context = {
+            'title': title,
+            'posts': post,
+            'total_posts': total_posts,
+            'form': form,
+            'comments': comments,
+            'shared_page': True,
+        }
+        return render(request, template, context)
+    return cached_page(
+        request,
+        [f'post:{post_id}', f'author:{author_id}'],
+        render_page,
+        shared=True
+    )
 
 
 @login_required
@@ -141,15 +188,31 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
+    """Shows posts of followed authors from user's materialized feed."""
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    title = f'Лента подписок пользователя {request.user.get_full_name()}'
-    context = {
-        'title': title,
-        'posts': posts,
-        'page_obj': pagination(request, posts, MAX_POSTS_VISIBLE),
-    }
-    return render(request, template, context)
+
+    def render_page():
+        posts = post_cards(feed_posts(request.user))
+        title = (
+            f'Лента подписок пользователя {request.user.get_full_name()}'
+        )
+        context = {
+            'title': title,
+            'posts': posts,
+            'page_obj': pagination(
+                request, posts, MAX_POSTS_VISIBLE, tie_breaker='feed_post'
+            ),
+        }
+        return render(request, template, context)
+    # Posts pushed into the feed bump it, posts of pull authors are read
+    # straight from the authors and bump only their scopes
+    pulled = Follow.objects.filter(
+        user=request.user,
+        pull=True
+    ).values_list('author_id', flat=True)
+    scopes = [f'feed:{request.user.pk}']
+    scopes += [f'author:{author_id}' for author_id in pulled]
+    return cached_page(request, scopes, render_page)
 
 
 @login_required
@@ -157,10 +220,7 @@ def profile_follow(request, username):
     """Starts following other user."""
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        if author.following.exists():
-            return redirect('posts:profile', username)
-        Follow.objects.create(user=request.user, author=author)
-        return redirect('posts:profile', username)
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username)
 
 
@@ -10,7 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
+from urllib.parse import urlparse
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +32,8 @@ SECRET_KEY = 'mhladi^uws#azsux&98vkj@o7l@ia@8)%j#442*=8l_lgawrft'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -52,12 +61,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.EdgeCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.FragmentMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -131,6 +142,10 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# collectstatic hashes the names and precompresses the files here, and
+# they are served from here with far future caching
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStorage'
 
 
 LOGIN_URL = 'users:login'
@@ -144,9 +159,65 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Uploads are named by content, so identical ones share a file
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+# Media are sent by the web server if it is set up for it: 'x-accel' for
+# nginx, which has MEDIA_ACCEL_PREFIX as an internal location of
+# MEDIA_ROOT, or 'x-sendfile' for Apache and lighttpd
+MEDIA_SENDFILE = os.getenv('YATUBE_MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# One cache shared by all workers: YATUBE_CACHE_URL is either
+# memcached://host:port, redis://host:port/db or file:///path, the local
+# stand-in for them used by default, kept in the checkout. Tests keep it
+# in a directory of their own, so they neither read nor clear the cache
+# of a server run from the checkout
+if TESTING:
+    CACHE_DIR = tempfile.mkdtemp(prefix='yatube-cache-')
+    atexit.register(shutil.rmtree, CACHE_DIR, True)
+else:
+    CACHE_DIR = os.path.join(BASE_DIR, '.cache')
+CACHE_URL = urlparse(os.getenv('YATUBE_CACHE_URL', 'file://' + CACHE_DIR))
+CACHE_BACKENDS = {
+    'file': ('core.cache.FileCache', CACHE_URL.path),
+    'memcached': ('core.cache.SharedMemcachedCache', CACHE_URL.netloc),
+    'redis': ('core.cache.RedisCache', CACHE_URL.geturl()),
+}
+if CACHE_URL.scheme not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'Unknown YATUBE_CACHE_URL scheme {CACHE_URL.scheme!r}, use one '
+        f'of: {", ".join(CACHE_BACKENDS)}.'
+    )
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_URL.scheme][0],
+        'LOCATION': CACHE_BACKENDS[CACHE_URL.scheme][1],
+        'KEY_PREFIX': os.getenv(
+            'YATUBE_CACHE_KEY_PREFIX', 'yatube-test' if TESTING else 'yatube'
+        ),
+        'COMPRESS_MIN_BYTES': 1024,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+
+# Thumbnails are looked up in the shared cache, backed by the database
+THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+# Thumbnails keep the names sorl gives them
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Authors with more followers than this are not pushed into followers' feeds,
+# their posts are pulled and merged at read time instead
+FEED_PULL_FOLLOWERS_THRESHOLD = 1000
+
+# Guests' pages are kept by the caching proxy until their surrogate keys
+# are purged, or this many seconds at most
+EDGE_CACHE_MAX_AGE = 60 * 60 * 24
+EDGE_PURGER = os.getenv('YATUBE_EDGE_PURGER', 'core.purge.NullPurger')
+EDGE_PURGE_URL = os.getenv('YATUBE_EDGE_PURGE_URL', 'http://127.0.0.1:6081/')
+
+# Work which follows a write, such as rendering the cards of a renamed
+# author, runs in background threads, or right away in tests
+BACKGROUND_JOBS_EAGER = TESTING
@@ -14,9 +14,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.media import serve_media, serve_static
 
 
 urlpatterns = [
@@ -25,15 +26,17 @@ urlpatterns = [
     path(r'auth/', include('users.urls', namespace='users')),
     path(r'auth/', include('django.contrib.auth.urls')),
     path(r'about/', include('about.urls', namespace='about')),
+    re_path(
+        r'^{}(?P<path>.+)$'.format(settings.MEDIA_URL.lstrip('/')),
+        serve_media
+    ),
+    re_path(
+        r'^{}(?P<path>.+)$'.format(settings.STATIC_URL.lstrip('/')),
+        serve_static
+    ),
 ]
 
 handler404 = 'core.views.page_not_found'
 handler400 = 'core.views.bad_request'
 handler403 = 'core.views.csrf_failure'
 handler500 = 'core.views.server_error'
-
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )